@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import datos_dashboard
+
+# Audiencias de los presets de campaña. Las reglas viven aquí (no en el
+# dashboard) para que el pipeline, el dashboard y la CLI usen exactamente las
+# mismas. La etapa "audiencias" las materializa una vez por versión del dataset.
+
+RUTA_AUDIENCIAS = os.path.join("data", "audiencias.parquet")
+RUTA_RESUMEN_AUDIENCIAS = os.path.join("data", "audiencias.json")
+
+PRESET_MANUAL = "Manual / Todos"
+
+# Por dimensión: "en" = valores exactos, "contiene" = el valor incluye alguno de
+# los textos. Las dimensiones que no aparecen quedan con todos sus valores.
+PRESETS = {
+    "Escudo de Oro (Retención VIP)": {
+        'Segmento_RFM': {"en": ['Campeones', 'VIPs Leales', 'Alto Potencial']},
+        'Categoria_Probabilidad_Abandono': {"contiene": ['Alta', 'Muy alta']},
+        'Potencial_Valor': {"contiene": ['Oro', 'Diamante']},
+    },
+    "Caja Rápida (Conversión)": {
+        'Segmento_Recompra': {"contiene": ['Alta', 'Muy Alta']},
+        'Segmento_RFM': {"en": ['Calidad Reciente', 'Nuevos Grandes Compradores', 'Estándar Reciente']},
+    },
+    "Diamantes en Bruto (Upselling)": {
+        'Segmento_RFM': {"en": ['Nuevos Clientes', 'Calidad Prometedora', 'Estándar']},
+        'Potencial_Valor': {"contiene": ['Oro', 'Diamante']},
+    },
+    "Operación Lázaro (Reactivación)": {
+        'Segmento_RFM': {"en": ['Críticos a Retener', 'En Riesgo', 'A Punto de Dormir']},
+        'Potencial_Valor': {"contiene": ['Oro', 'Plata']},
+    },
+}
+
+
+def _cumple(valor, regla):
+    if "en" in regla:
+        return valor in regla["en"]
+    return any(texto in valor for texto in regla.get("contiene", []))
+
+
+def selecciones_preset(nombre, opciones):
+    # opciones = {dimensión: valores disponibles}; devuelve la selección de cada dimensión
+    reglas = PRESETS.get(nombre, {})
+    return {
+        dim: [v for v in valores if _cumple(v, reglas[dim])] if dim in reglas else list(valores)
+        for dim, valores in opciones.items()
+    }
+
+
+# --- MATERIALIZACIÓN (ETAPA DEL PIPELINE) ---
+def materializar_audiencias(ruta_dataset, ruta_audiencias, ruta_resumen, memoria=None):
+    # Con el runner "proceso" el dataset llega en memoria desde la etapa anterior
+    if memoria is not None and ruta_dataset in memoria:
+        df = memoria[ruta_dataset]
+    else:
+        df = datos_dashboard.cargar_dataset(ruta_dataset)
+    indice = datos_dashboard.IndiceFiltros(df)
+    cubo = datos_dashboard.CuboSegmentos(df)
+    opciones = {dim: sorted(df[dim].dropna().unique().tolist()) for dim in indice.dimensiones}
+    cuentas = df['CUENTA'].to_numpy(dtype=object)
+
+    nombres, ids, resumen = [], [], {}
+    for nombre in PRESETS:
+        selecciones = selecciones_preset(nombre, opciones)
+        # IDs ordenados: búsqueda binaria y cruces baratos para quien los consuma
+        miembros = np.sort(cuentas[indice.filtrar(selecciones)].astype(str))
+        nombres.append(np.full(len(miembros), nombre, dtype=object))
+        ids.append(miembros)
+        kpis = cubo.kpis(selecciones)
+        resumen[nombre] = {
+            "selecciones": selecciones,
+            "kpis": {k: (None if v is None or (isinstance(v, float) and np.isnan(v)) else float(v))
+                     for k, v in kpis.items()},
+        }
+
+    tabla = pa.table({
+        'preset': pa.array(np.concatenate(nombres) if nombres else [], pa.string()).dictionary_encode(),
+        'CUENTA': pa.array(np.concatenate(ids) if ids else [], pa.string()),
+    })
+    temporal = f"{ruta_audiencias}.tmp"
+    pq.write_table(tabla, temporal, compression="zstd")
+    os.replace(temporal, ruta_audiencias)
+
+    temporal = f"{ruta_resumen}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "filas_dataset": len(df),
+            "presets": resumen,
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta_resumen)
+
+
+# --- LECTURA ---
+def rutas_version(version=None):
+    # Artefactos de la versión publicada; sin manifiesto, los de data/
+    adjuntos = (version or {}).get("adjuntos", {})
+    return (adjuntos.get(os.path.basename(RUTA_AUDIENCIAS), RUTA_AUDIENCIAS),
+            adjuntos.get(os.path.basename(RUTA_RESUMEN_AUDIENCIAS), RUTA_RESUMEN_AUDIENCIAS))
+
+
+def leer_resumen(ruta_resumen=RUTA_RESUMEN_AUDIENCIAS):
+    try:
+        with open(ruta_resumen, encoding="utf-8") as f:
+            return json.load(f).get("presets", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def leer_audiencia(nombre, ruta_audiencias=RUTA_AUDIENCIAS):
+    # Solo se leen las filas del preset (filtro empujado al lector de Parquet)
+    tabla = pq.read_table(ruta_audiencias, columns=['CUENTA'], filters=[('preset', '=', nombre)])
+    return tabla.column('CUENTA').to_numpy(zero_copy_only=False)
+
+
+def buscar_preset(texto):
+    # Acepta el nombre completo o un fragmento ("escudo", "lázaro")
+    if texto in PRESETS:
+        return texto
+    candidatos = [p for p in PRESETS if texto.lower() in p.lower()]
+    if len(candidatos) != 1:
+        raise KeyError(f"Preset '{texto}' no encontrado o ambiguo. Opciones: {', '.join(PRESETS)}")
+    return candidatos[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audiencias precalculadas de los presets de campaña")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="Resumen de KPIs por preset")
+    exportar = sub.add_parser("exportar", help="Escribe las cuentas de un preset (una por línea)")
+    exportar.add_argument("preset", help="Nombre del preset o un fragmento")
+    exportar.add_argument("--salida", help="Archivo de salida (por defecto, la consola)")
+    args = parser.parse_args(argv)
+
+    ruta_audiencias, ruta_resumen = rutas_version(datos_dashboard.version_actual())
+    if not os.path.exists(ruta_resumen):
+        print(f"No hay audiencias materializadas ({ruta_resumen}). Ejecuta run_pipeline.py.")
+        return 1
+
+    if args.comando == "listar":
+        resumen = leer_resumen(ruta_resumen)
+        print(f"{'Preset':<34} {'Cuentas':>12} {'Churn':>7} {'CLV 90d':>16} {'Compra':>7}")
+        for nombre, datos in resumen.items():
+            k = datos["kpis"]
+            churn = "-" if k["churn_medio"] is None else f"{k['churn_medio']:.1%}"
+            compra = "-" if k["compra_media"] is None else f"{k['compra_media']:.1%}"
+            print(f"{nombre:<34} {int(k['cuentas']):>12,} {churn:>7} {k['clv_total']:>16,.0f} {compra:>7}")
+        return 0
+
+    try:
+        nombre = buscar_preset(args.preset)
+    except KeyError as e:
+        print(e.args[0])
+        return 1
+    cuentas = leer_audiencia(nombre, ruta_audiencias)
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    try:
+        salida.write("CUENTA\n")
+        salida.writelines(f"{c}\n" for c in cuentas)
+    finally:
+        if args.salida:
+            salida.close()
+            print(f"{len(cuentas):,} cuentas de '{nombre}' en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
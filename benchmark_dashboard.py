@@ -0,0 +1,198 @@
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+from statistics import median
+import numpy as np
+
+import telemetria
+import audiencias
+import datos_dashboard
+import datos_sinteticos
+import motores_dashboard
+
+# Benchmark del dashboard sin navegador: sobre carteras sintéticas de varios
+# tamaños mide la carga del dataset y cada consulta de un rerun (filtro, KPIs,
+# conteos de los gráficos, búsqueda, orden de la tabla, muestra del scatter y
+# densidad), con cada motor. Los resultados van a un JSON que se puede usar
+# como línea base de la siguiente corrida (--base).
+
+CARPETA_SALIDA = os.path.join("./logs", "benchmarks")
+REPETICIONES = 5
+PRESET_BENCHMARK = "Escudo de Oro (Retención VIP)"
+TAM_PAGINA = 50
+COLUMNAS_TABLA = ['CUENTA', 'NEGOCIO', 'Segmento_RFM', 'Potencial_Valor', 'CLV_90dias',
+                  'Producto_Recomendado', 'Confianza_Recomendacion', 'Categoria_Cross_Sell']
+
+
+def escenarios(motor):
+    # Selecciones de la barra lateral: todo, un preset y un filtro estrecho
+    opciones = {dim: motor.opciones(dim) for dim in datos_dashboard.DIMENSIONES_FILTRO}
+    opciones = {dim: valores for dim, valores in opciones.items() if valores}
+    estrecho = dict(opciones)
+    for dim, valores in opciones.items():
+        if dim in ('NEGOCIO', 'Segmento_RFM'):
+            estrecho[dim] = valores[:2]
+    return {
+        "todos": opciones,
+        "preset": audiencias.selecciones_preset(PRESET_BENCHMARK, opciones),
+        "estrecho": estrecho,
+    }
+
+
+def mascara_pandas(df, selecciones):
+    # Referencia: el filtro original del dashboard (isin por dimensión y copia del resultado)
+    mascara = np.ones(len(df), dtype=bool)
+    for dim, seleccion in selecciones.items():
+        mascara &= df[dim].isin(seleccion).to_numpy()
+    return df[mascara]
+
+
+def operaciones(motor, tipo, selecciones, busqueda):
+    ops = {
+        "filtro": lambda: motor.total_scatter(selecciones),
+        "kpis": lambda: motor.kpis(selecciones),
+        "conteos": lambda: (motor.conteo_por('Segmento_RFM', selecciones),
+                            motor.conteo_por('Potencial_Valor', selecciones)),
+        "busqueda": lambda: motor.pagina_tabla(selecciones, busqueda, "Contiene", None, True, 0,
+                                               TAM_PAGINA, COLUMNAS_TABLA),
+        "orden_tabla": lambda: motor.pagina_tabla(selecciones, "", "Contiene", 'CLV_90dias', True, 0,
+                                                  TAM_PAGINA, COLUMNAS_TABLA),
+        "muestra_scatter": lambda: motor.muestra_scatter(selecciones),
+        "densidad": lambda: motor.densidad(selecciones),
+    }
+    if tipo == "memoria":
+        ops["mascara_pandas"] = lambda: mascara_pandas(motor.df, selecciones)
+    return ops
+
+
+def cronometrar(funcion, repeticiones):
+    # La primera llamada incluye lo que se construye una sola vez (rangos de
+    # orden, índice de búsqueda); la mediana, el costo de los reruns siguientes
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "primera_s": tiempos[0],
+        "mediana_s": median(tiempos[1:] or tiempos),
+        "min_s": min(tiempos),
+        "repeticiones": len(tiempos),
+    }
+
+
+def cargar(tipo, ruta):
+    # memo=0: cada consulta repite el filtro, como el primer rerun tras cambiar la selección
+    if tipo == "memoria":
+        return motores_dashboard.MotorMemoria(datos_dashboard.cargar_dataset(ruta), memo=0)
+    return motores_dashboard.crear_motor(tipo, ruta=ruta)
+
+
+def medir(tamano, tipo, ruta, repeticiones):
+    resultados = []
+    base = {"tamano": tamano, "filas": datos_sinteticos.filas_de(tamano), "motor": tipo}
+    rss_antes = telemetria.rss_mb()
+    with telemetria.MedidorEtapa(intervalo=0.05) as medidor:
+        motor = cargar(tipo, ruta)
+    rss_despues = telemetria.rss_mb()
+    resultados.append({**base, "escenario": "-", "operacion": "carga", "primera_s": medidor.wall_s,
+                       "mediana_s": medidor.wall_s, "min_s": medidor.wall_s, "repeticiones": 1,
+                       "cpu_s": medidor.cpu_s, "rss_pico_mb": medidor.rss_pico_mb,
+                       "rss_delta_mb": None if rss_antes is None else rss_despues - rss_antes})
+    print(f"  carga{'':<26} {medidor.wall_s:>9.3f} s")
+
+    # Un fragmento de una cuenta real, para que la búsqueda encuentre resultados
+    primera, _ = motor.pagina_tabla({}, "", "Contiene", None, False, 0, 1, ['CUENTA'])
+    busqueda = str(primera['CUENTA'].iloc[0])[-6:-2] if len(primera) else "1234"
+
+    for escenario, selecciones in escenarios(motor).items():
+        for operacion, funcion in operaciones(motor, tipo, selecciones, busqueda).items():
+            tiempos = cronometrar(funcion, repeticiones)
+            resultados.append({**base, "escenario": escenario, "operacion": operacion, **tiempos})
+            print(f"  {escenario:<9} {operacion:<20} {tiempos['mediana_s']:>9.4f} s "
+                  f"(primera {tiempos['primera_s']:.4f} s)")
+    del motor
+    gc.collect()
+    return resultados
+
+
+# --- COMPARACIÓN CONTRA UNA CORRIDA ANTERIOR ---
+def _clave(r):
+    return (r["tamano"], r["motor"], r["escenario"], r["operacion"])
+
+
+def comparar(resultados, base, umbral=0.25, minimo_s=0.005):
+    # Regresión: la mediana sube más del umbral y más de minimo_s (ruido en tiempos de ms)
+    anteriores = {_clave(r): r for r in base}
+    filas, alertas = [], []
+    for r in resultados:
+        previo = anteriores.get(_clave(r))
+        if previo is None or not previo["mediana_s"]:
+            continue
+        cambio = (r["mediana_s"] - previo["mediana_s"]) / previo["mediana_s"]
+        fila = {"clave": _clave(r), "actual": r["mediana_s"], "base": previo["mediana_s"], "cambio": cambio}
+        filas.append(fila)
+        if cambio > umbral and r["mediana_s"] - previo["mediana_s"] > minimo_s:
+            alertas.append(fila)
+    return filas, alertas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del dashboard sobre carteras sintéticas")
+    parser.add_argument("--tamanos", nargs="+", default=["100k", "1m"],
+                        help=f"Cuentas: {', '.join(datos_sinteticos.TAMANOS)} o un número")
+    motores = motores_dashboard.MOTORES if motores_dashboard.duckdb is not None else ["memoria"]
+    parser.add_argument("--motores", nargs="+", choices=motores_dashboard.MOTORES, default=motores)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES, help="Llamadas por operación")
+    parser.add_argument("--carpeta-datos", default=datos_sinteticos.CARPETA_SINTETICOS,
+                        help="Dónde se generan (y reutilizan) las carteras sintéticas")
+    parser.add_argument("--salida", help="JSON de resultados (por defecto, logs/benchmarks/benchmark_<fecha>.json)")
+    parser.add_argument("--base", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Aumento relativo que se considera regresión")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for tamano in args.tamanos:
+        ruta = datos_sinteticos.preparar(tamano, args.carpeta_datos)
+        for tipo in args.motores:
+            print(f"\n=== {tamano} cuentas, motor {tipo} ===")
+            resultados.extend(medir(tamano, tipo, ruta, max(1, args.repeticiones)))
+
+    fecha = datetime.now()
+    salida = args.salida or os.path.join(CARPETA_SALIDA, f"benchmark_{fecha.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": fecha.isoformat(timespec="seconds"),
+            "maquina": {"cpus": os.cpu_count(), "plataforma": platform.platform(),
+                        "python": platform.python_version()},
+            "repeticiones": args.repeticiones,
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {salida}")
+
+    if not args.base:
+        return 0
+    with open(args.base, encoding="utf-8") as f:
+        filas, alertas = comparar(resultados, json.load(f)["resultados"], umbral=args.umbral)
+    print(f"\nComparación contra {args.base} (mediana)\n")
+    print(f"{'Tamaño':<7} {'Motor':<8} {'Escenario':<9} {'Operación':<16} {'Actual':>10} {'Base':>10} {'Cambio':>8}")
+    for f in filas:
+        tamano, motor, escenario, operacion = f["clave"]
+        marca = "  <-- REGRESIÓN" if f in alertas else ""
+        print(f"{tamano:<7} {motor:<8} {escenario:<9} {operacion:<16} {f['actual']:>10.4f} {f['base']:>10.4f} "
+              f"{f['cambio']:>+8.1%}{marca}")
+    if alertas:
+        print(f"\n{len(alertas)} operación(es) por encima del umbral de {args.umbral:.0%}.")
+        return 1
+    print("\nSin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
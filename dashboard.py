@@ -1,8 +1,14 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
 
+import datos_dashboard
+import motores_dashboard
+import audiencias
+import perfil_dashboard
+
 # 1. CONFIGURACIÓN DE PÁGINA
 st.set_page_config(
     page_title="Intelligence Dashboard | Quintiles",
@@ -10,6 +16,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Perfil de render opcional (?perfil=1 o DASHBOARD_PERFIL=1, ver perfil_dashboard.py).
+# Cada perfil.seccion() cierra la sección anterior; sin perfil no hacen nada.
+if "perfil_sesion" not in st.session_state:
+    st.session_state.perfil_sesion = os.urandom(4).hex()
+perfil = perfil_dashboard.PerfilRender(perfil_dashboard.activado(st.query_params), st.session_state.perfil_sesion)
+perfil.seccion("estilos")
+
 # 2. ESTILO CSS PERSONALIZADO (Aesthetic & Minimalist)
 st.markdown("""
     <style>
@@ -42,56 +55,36 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 3. CARGA DE DATOS OPTIMIZADA
-@st.cache_data
-def load_data():
-    try:
-        df = pd.read_parquet('rfm_churn_ltv.parquet')
-        #df = pd.read_csv('Quintiles.csv', sep=None, engine='python', encoding='utf-8-sig')
-
-        df.columns = df.columns.str.strip()
-        df = df.replace('Dato no disponible', pd.NA)
-        
-        numeric_cols = ['Probabilidad_Churn', 'Probabilidad_Compra_90d', 'Monto_Esperado_90d', 'CLV_90dias']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # --- SEGMENTACIÓN ROBUSTA ---
-        
-        # 1. Propensión de Recompra
-        p_col = 'Probabilidad_Compra_90d'
-        if p_col in df.columns and df[p_col].notnull().any():
-            bins_p = [-0.001, 0.25, 0.50, 0.75, 1.001]
-            labels_p = ['Baja Propensión', 'Propensión Media', 'Alta Propensión', 'Muy Alta Propensión']
-            df['Segmento_Recompra'] = pd.cut(df[p_col], bins=bins_p, labels=labels_p)
-        else:
-            df['Segmento_Recompra'] = 'Sin datos'
-
-        # 2. Valor Futuro (Cuartiles)
-        v_col = 'CLV_90dias'
-        if v_col in df.columns and df[v_col].notnull().any():
-            try:
-                quantile_labels = ['Valor Bronce', 'Valor Plata', 'Valor Oro', 'Valor Diamante']
-                edges = df[v_col].quantile([0, 0.25, 0.5, 0.75, 1.0]).unique()
-                if len(edges) > 1:
-                    actual_labels = quantile_labels[:len(edges)-1]
-                    df['Potencial_Valor'] = pd.cut(df[v_col], bins=edges, labels=actual_labels, include_lowest=True)
-                else:
-                    df['Potencial_Valor'] = 'Valor Único'
-            except:
-                df['Potencial_Valor'] = 'Indeterminado'
-        else:
-            df['Potencial_Valor'] = 'Sin datos'
-            
-        return df
-    except Exception as e:
-        st.error(f"Error crítico al cargar el archivo: {e}")
-        return None
-
-df_raw = load_data()
+# El pipeline (etapa "finalizacion") deja el dataset listo. Aquí solo se leen
+# las columnas que usa la app, con tipos compactos (ver datos_dashboard.py;
+# `python datos_dashboard.py` imprime el ahorro de memoria por columna).
+# Sin st.cache_data: ese caché serializa el valor y entrega una copia a cada
+# llamada. El DataFrame vive solo dentro del motor (una copia por versión,
+# compartida por todas las sesiones y de solo lectura); cada sesión guarda
+# únicamente sus selecciones (`python prueba_carga.py`).
+#
+# Motor de consultas (DASHBOARD_MOTOR): "memoria" carga el dataset en el
+# proceso; "duckdb" consulta el Parquet en disco sin cargarlo (carteras más
+# grandes que la RAM).
+#
+# Recarga en caliente: el gestor vigila el manifiesto que publica el pipeline
+# (data/dashboard_actual.json). Una versión nueva se carga en segundo plano y
+# los reruns pasan a usarla cuando está lista, sin reiniciar la app.
+@st.cache_resource
+def load_gestor():
+    return motores_dashboard.GestorVersiones()
+
+perfil.seccion("carga")
+gestor = load_gestor()
+try:
+    motor = gestor.motor()
+except Exception as e:
+    st.error(f"Error crítico al cargar el archivo: {e}")
+    motor = None
 
 # --- 4. BARRA LATERAL (FILTROS) ---
-if df_raw is not None:
+if motor is not None:
+    perfil.seccion("barra_lateral")
     # Definir el ordenamiento de RFM solicitado
     segmento_a_calificacion = {
         'Campeones': 1, 'VIPs Leales': 2, 'Alto Potencial': 3, 'VIPs Potenciales': 4,
@@ -115,35 +108,36 @@ if df_raw is not None:
         }
 
         # 1. Listas base de datos
-        all_bus = sorted(df_raw['NEGOCIO'].dropna().unique().tolist()) if 'NEGOCIO' in df_raw.columns else []
-        all_rec = sorted(df_raw['Segmento_Recompra'].dropna().unique().tolist())
-        all_val = sorted(df_raw['Potencial_Valor'].dropna().unique().tolist())
-        all_rfm = sorted(df_raw['Segmento_RFM'].dropna().unique().tolist(), key=lambda x: segmento_a_calificacion.get(x, 99))
-        all_risk = sorted(df_raw['Categoria_Probabilidad_Abandono'].dropna().unique().tolist())
+        all_bus = motor.opciones('NEGOCIO')
+        all_rec = motor.opciones('Segmento_Recompra')
+        all_val = motor.opciones('Potencial_Valor')
+        all_rfm = sorted(motor.opciones('Segmento_RFM'), key=lambda x: segmento_a_calificacion.get(x, 99))
+        all_risk = motor.opciones('Categoria_Probabilidad_Abandono')
+
+        # Tras recargar una versión nueva, quitar de los filtros valores que ya no existen
+        for key_ms, full_list in [("ms_bus", all_bus), ("ms_rec", all_rec), ("ms_val", all_val),
+                                  ("ms_rfm", all_rfm), ("ms_risk", all_risk)]:
+            if key_ms in st.session_state:
+                st.session_state[key_ms] = [v for v in st.session_state[key_ms] if v in full_list]
+
+        # Audiencias de los presets que el pipeline precalculó para esta versión de los datos
+        _, ruta_resumen = audiencias.rutas_version(gestor.info_activa)
+        resumen_presets = audiencias.leer_resumen(ruta_resumen)
 
         # 2. Funciones para forzar el cambio (Callbacks)
         def aplicar_estrategia():
             est = st.session_state.selector_estrategia
-            # Reset por defecto a todo
-            st.session_state.ms_bus = all_bus
-            st.session_state.ms_rec = all_rec
-            st.session_state.ms_val = all_val
-            st.session_state.ms_rfm = all_rfm
-            st.session_state.ms_risk = all_risk
-
-            if est == "Escudo de Oro (Retención VIP)":
-                st.session_state.ms_rfm = [s for s in all_rfm if s in ['Campeones', 'VIPs Leales', 'Alto Potencial']]
-                st.session_state.ms_risk = [s for s in all_risk if 'Alta' in s or 'Muy alta' in s]
-                st.session_state.ms_val = [s for s in all_val if 'Oro' in s or 'Diamante' in s]
-            elif est == "Caja Rápida (Conversión)":
-                st.session_state.ms_rec = [s for s in all_rec if 'Alta' in s or 'Muy Alta' in s]
-                st.session_state.ms_rfm = [s for s in all_rfm if s in ['Calidad Reciente', 'Nuevos Grandes Compradores', 'Estándar Reciente']]
-            elif est == "Diamantes en Bruto (Upselling)":
-                st.session_state.ms_rfm = [s for s in all_rfm if s in ['Nuevos Clientes', 'Calidad Prometedora', 'Estándar']]
-                st.session_state.ms_val = [s for s in all_val if 'Oro' in s or 'Diamante' in s]
-            elif est == "Operación Lázaro (Reactivación)":
-                st.session_state.ms_rfm = [s for s in all_rfm if s in ['Críticos a Retener', 'En Riesgo', 'A Punto de Dormir']]
-                st.session_state.ms_val = [s for s in all_val if 'Oro' in s or 'Plata' in s]
+            opciones = {
+                'NEGOCIO': all_bus, 'Segmento_Recompra': all_rec, 'Potencial_Valor': all_val,
+                'Segmento_RFM': all_rfm, 'Categoria_Probabilidad_Abandono': all_risk,
+            }
+            # Selección precalculada; sin artefactos se evalúan las reglas (audiencias.PRESETS).
+            # "Manual / Todos" no tiene reglas: vuelve todo a seleccionado.
+            seleccion = resumen_presets.get(est, {}).get("selecciones") or audiencias.selecciones_preset(est, opciones)
+            for dim, key_ms in [('NEGOCIO', 'ms_bus'), ('Segmento_Recompra', 'ms_rec'), ('Potencial_Valor', 'ms_val'),
+                                ('Segmento_RFM', 'ms_rfm'), ('Categoria_Probabilidad_Abandono', 'ms_risk')]:
+                elegidos = set(seleccion.get(dim, opciones[dim]))
+                st.session_state[key_ms] = [s for s in opciones[dim] if s in elegidos]
 
         def toggle_select_all(key_checkbox, key_ms, full_list):
             if st.session_state[key_checkbox]:
@@ -160,14 +154,18 @@ if df_raw is not None:
             help="Al elegir una estrategia, los filtros de abajo se ajustarán automáticamente."
         )
         
-        st.markdown(f"""<div style="background-color: #F9FAFB; border: 1px solid #E5E7EB; padding: 12px; border-radius: 8px; font-size: 0.82rem; color: #6B7280; line-height: 1.4; margin-bottom: 20px;">{explicaciones[estrategia]}</div>""", unsafe_allow_html=True)
+        audiencia = ""
+        if estrategia in resumen_presets:
+            k = resumen_presets[estrategia]["kpis"]
+            audiencia = f"<br><b>Audiencia:</b> {int(k['cuentas']):,} cuentas · CLV ${k['clv_total']:,.0f}"
+        st.markdown(f"""<div style="background-color: #F9FAFB; border: 1px solid #E5E7EB; padding: 12px; border-radius: 8px; font-size: 0.82rem; color: #6B7280; line-height: 1.4; margin-bottom: 20px;">{explicaciones[estrategia]}{audiencia}</div>""", unsafe_allow_html=True)
         
         st.divider()
         st.markdown('<p class="sidebar-title">Configuración de Filtros</p>', unsafe_allow_html=True)
 
         # 4. RENDERIZADO DE FILTROS (Uso de Session State directo)
         
-        if 'NEGOCIO' in df_raw.columns:
+        if 'NEGOCIO' in motor.columnas:
             with st.expander("Tipo de Negocio", expanded=False):
                 st.checkbox("Seleccionar todos", key="chk_bus", value=True, on_change=toggle_select_all, args=("chk_bus", "ms_bus", all_bus))
                 if "ms_bus" not in st.session_state: st.session_state.ms_bus = all_bus
@@ -199,18 +197,29 @@ if df_raw is not None:
                     del st.session_state[k]
             st.rerun()
 
+        if gestor.cargando:
+            st.caption("⏳ Cargando una versión nueva de los datos…")
+        if gestor.error:
+            st.warning(f"No se pudo cargar la versión nueva: {gestor.error}")
+        st.caption(f"Datos: {gestor.etiqueta_activa}")
 
-    # --- FILTRADO (Se mantiene igual pero con las variables actualizadas) ---
-    mask = (
-        (df_raw['Segmento_RFM'].isin(selected_rfm)) &
-        (df_raw['Categoria_Probabilidad_Abandono'].isin(selected_abandon)) &
-        (df_raw['Segmento_Recompra'].isin(selected_recompra)) &
-        (df_raw['Potencial_Valor'].isin(selected_valor))
-    )
-    if 'NEGOCIO' in df_raw.columns:
-        mask = mask & (df_raw['NEGOCIO'].isin(selected_bus))
-        
-    df_filtered = df_raw[mask].copy()
+
+    # --- FILTRADO (el motor resuelve cada consulta a partir de las selecciones) ---
+    selecciones = {
+        'Segmento_RFM': selected_rfm,
+        'Categoria_Probabilidad_Abandono': selected_abandon,
+        'Segmento_Recompra': selected_recompra,
+        'Potencial_Valor': selected_valor,
+    }
+    if 'NEGOCIO' in motor.columnas:
+        selecciones['NEGOCIO'] = selected_bus
+
+    # KPIs, gráficos de composición y resumen son agregados; el scatter y la
+    # tabla solo traen las filas que muestran
+    perfil.seccion("kpis")
+    kpis = motor.kpis(selecciones)
+    perfil.contexto(motor=type(motor).__name__, version=gestor.version_activa, cuentas=int(kpis['cuentas']),
+                    estrategia=st.session_state.get("selector_estrategia"))
 
 
     # --- 5. CUERPO PRINCIPAL ---
@@ -218,15 +227,15 @@ if df_raw is not None:
     
     m1, m2, m3, m4 = st.columns(4)
     with m1:
-        st.metric("Cuentas Seleccionadas", f"{len(df_filtered):,}")
+        st.metric("Cuentas Seleccionadas", f"{kpis['cuentas']:,}")
     with m2:
-        val = df_filtered['Probabilidad_Churn'].mean()
+        val = kpis['churn_medio']
         st.metric("Riesgo Churn Promedio", f"{val:.1%}" if pd.notnull(val) else "0%")
     with m3:
-        val = df_filtered['CLV_90dias'].sum()
+        val = kpis['clv_total']
         st.metric("CLV Total (90d)", f"${val:,.0f}")
     with m4:
-        val = df_filtered['Probabilidad_Compra_90d'].mean()
+        val = kpis['compra_media']
         st.metric("Propensión Compra", f"{val:.1%}" if pd.notnull(val) else "0%")
 
     # --- 6. GRÁFICOS ---
@@ -237,10 +246,12 @@ if df_raw is not None:
     
     with c1:
         # 1. Preparar datos
-        df_rfm_counts = df_filtered['Segmento_RFM'].value_counts().reset_index()
+        perfil.seccion("rfm.consulta")
+        df_rfm_counts = motor.conteo_por('Segmento_RFM', selecciones).reset_index()
         df_rfm_counts.columns = ['Segmento', 'Cantidad']
         
         # 2. Crear Gráfico con Estética Premium
+        perfil.seccion("rfm.figura")
         fig_rfm = px.bar(
             df_rfm_counts, 
             x='Cantidad', 
@@ -290,13 +301,19 @@ if df_raw is not None:
             margin=dict(l=20, r=40, t=70, b=20)
         )
 
+        perfil.seccion("rfm.envio")
+        perfil.envio(fig_rfm)
         st.plotly_chart(fig_rfm, use_container_width=True)
 
 
     with c2:
+        perfil.seccion("valor.consulta")
+        df_valor_counts = motor.conteo_por('Potencial_Valor', selecciones).reset_index()
+        perfil.seccion("valor.figura")
         fig_v = px.pie(
-            df_filtered, 
+            df_valor_counts, 
             names='Potencial_Valor', 
+            values='cuentas',
             title="<b>Cuentas por Nivel de Valor (CLV)</b>", # Agregamos <b> para que sea negrita igual que el otro
             hole=0.5, 
             color_discrete_sequence=px.colors.qualitative.Pastel
@@ -312,10 +329,13 @@ if df_raw is not None:
             height=550, # Igualamos la altura para que las cajas se vean alineadas
             margin=dict(l=20, r=20, t=70, b=20) # Ajustamos márgenes superiores para el título
         )
+        perfil.seccion("valor.envio")
+        perfil.envio(fig_v)
         st.plotly_chart(fig_v, use_container_width=True)
 
 
     # FILA 2: Análisis Predictivo (Scatter Plot)
+    perfil.seccion("scatter.consulta")
     st.markdown('<p class="section-header">Relación Propensión vs Valor Esperado</p>', unsafe_allow_html=True)
     
     # Seleccionamos las columnas necesarias para asegurar que existan en el hover
@@ -329,9 +349,48 @@ if df_raw is not None:
         'Categoria_Probabilidad_Abandono'
     ]
     
-    df_scat = df_filtered.dropna(subset=['Probabilidad_Compra_90d', 'Monto_Esperado_90d']).head(3000)
+    v1, v2 = st.columns([3, 2])
+    with v1:
+        vista_scatter = st.radio("Vista", ["Automática", "Muestra", "Densidad"], horizontal=True, key="vista_scatter")
+    with v2:
+        puntos_scatter = st.select_slider("Puntos en la muestra", options=datos_dashboard.OPCIONES_PUNTOS,
+                                          value=datos_dashboard.PUNTOS_SCATTER)
+
+    total_scat = motor.total_scatter(selecciones)
+    usar_densidad = vista_scatter == "Densidad" or (
+        vista_scatter == "Automática" and total_scat > datos_dashboard.UMBRAL_DENSIDAD
+    )
+
+    if usar_densidad and total_scat > 0:
+        # Selecciones grandes: mapa de densidad calculado en el servidor (no se envían los puntos)
+        conteos, centros_x, centros_y, df_out = motor.densidad(selecciones)
+        perfil.seccion("scatter.figura")
+        fig_d = px.imshow(
+            conteos, x=centros_x, y=centros_y, origin='lower', aspect='auto',
+            color_continuous_scale='Blues', labels=dict(color="Cuentas")
+        )
+        # Las cuentas de mayor CLV se dibujan siempre encima
+        fig_d.add_scatter(
+            x=df_out['Probabilidad_Compra_90d'], y=df_out['Monto_Esperado_90d'], mode='markers',
+            marker=dict(color='#DC2626', size=7), name="Top CLV", text=df_out['CUENTA'],
+            hovertemplate="%{text}<br>Prob: %{x:.2%}<br>Monto: $%{y:,.2f}<extra>Top CLV</extra>"
+        )
+        fig_d.update_layout(
+            xaxis_title="Probabilidad de Compra (%)",
+            yaxis_title="Monto Esperado ($)",
+            legend=dict(orientation="h", yanchor="bottom", y=1.02)
+        )
+        perfil.seccion("scatter.envio")
+        perfil.envio(fig_d)
+        st.plotly_chart(fig_d, use_container_width=True)
+        st.caption(f"Densidad de {total_scat:,} cuentas. En rojo, las {len(df_out)} de mayor CLV.")
+        df_scat = None
+    else:
+        # Muestra estratificada por propensión, determinista, con los outliers de CLV
+        df_scat = motor.muestra_scatter(selecciones, presupuesto=puntos_scatter)
     
-    if not df_scat.empty:
+    if df_scat is not None and not df_scat.empty:
+        perfil.seccion("scatter.figura")
         fig_s = px.scatter(
             df_scat, 
             x='Probabilidad_Compra_90d', 
@@ -363,20 +422,34 @@ if df_raw is not None:
             yaxis_title="Monto Esperado ($)"
         )
         
+        perfil.seccion("scatter.envio")
+        perfil.envio(fig_s)
         st.plotly_chart(fig_s, use_container_width=True)
-    else:
+        if len(df_scat) < total_scat:
+            st.caption(f"Muestra de {len(df_scat):,} de {total_scat:,} cuentas, estratificada por propensión.")
+    elif df_scat is not None:
         st.info("Sin datos predictivos suficientes para el gráfico de dispersión.")
 
 
     # --- 7. TABLA ---
+    perfil.seccion("tabla.consulta")
     st.markdown('<p class="section-header">Explorador de Clientes y Recomendaciones</p>', unsafe_allow_html=True)
     
-    # MODIFICACIÓN: Buscador de cuenta
-    search_query = st.text_input("Buscar cuenta específica:", placeholder="Ingrese ID de cuenta...")
+    # MODIFICACIÓN: Buscador de cuenta (se cruza con los filtros activos)
+    s1, s2 = st.columns([4, 1])
+    with s1:
+        search_query = st.text_input("Buscar cuenta específica:", placeholder="Ingrese ID de cuenta...")
+    with s2:
+        modo_busqueda = st.selectbox("Coincidencia", datos_dashboard.MODOS_BUSQUEDA, key="modo_busqueda")
     
-    df_table = df_filtered.copy()
-    if search_query:
-        df_table = df_table[df_table['CUENTA'].astype(str).str.contains(search_query, case=False, na=False)]
+    # Orden y paginación en el servidor: al navegador solo viaja la página visible
+    o1, o2, o3, o4 = st.columns([2, 1, 1, 1])
+    with o1:
+        orden_label = st.selectbox("Ordenar por", list(datos_dashboard.COLUMNAS_ORDEN), key="orden_tabla")
+    with o2:
+        descendente = st.radio("Sentido", ["Desc", "Asc"], horizontal=True, key="sentido_tabla") == "Desc"
+    with o3:
+        tam_pagina = st.selectbox("Filas por página", datos_dashboard.TAMANOS_PAGINA, index=1, key="tam_pagina")
 
     cols_t = [
         'CUENTA', 
@@ -389,25 +462,64 @@ if df_raw is not None:
         'Categoria_Cross_Sell'
     ]
 
+    # El total depende de filtros y búsqueda, no de la página: se consulta la primera
+    # para acotar el selector y luego la pedida
+    pagina_actual = st.session_state.get("pagina_tabla", 1)
+    df_table, total_tabla = motor.pagina_tabla(
+        selecciones, search_query, modo_busqueda, datos_dashboard.COLUMNAS_ORDEN[orden_label],
+        descendente, pagina_actual - 1, tam_pagina, cols_t
+    )
+    total_paginas = max(1, -(-total_tabla // tam_pagina))
+    with o4:
+        num_pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1, key="pagina_tabla")
+    num_pagina = min(num_pagina, total_paginas)
+    if num_pagina != pagina_actual:
+        df_table, total_tabla = motor.pagina_tabla(
+            selecciones, search_query, modo_busqueda, datos_dashboard.COLUMNAS_ORDEN[orden_label],
+            descendente, num_pagina - 1, tam_pagina, cols_t
+        )
+
+    perfil.seccion("tabla.envio")
+    perfil.envio(df_table)
     st.dataframe(
-        df_table[cols_t], use_container_width=True, height=400,
+        df_table, use_container_width=True, height=400,
         column_config={
             "CLV_90dias": st.column_config.NumberColumn("Valor Proyectado", format="$%.2f"),
             "CUENTA": st.column_config.TextColumn("Cuenta")
         }, hide_index=True
     )
+    if total_tabla:
+        desde = (num_pagina - 1) * tam_pagina + 1
+        st.caption(f"Mostrando {desde:,}–{desde + len(df_table) - 1:,} de {total_tabla:,} cuentas · página {num_pagina} de {total_paginas:,}")
 
     # --- 8. INSIGHTS ---
+    perfil.seccion("resumen")
     st.markdown('<p class="section-header">Resumen</p>', unsafe_allow_html=True)
     i1, i2, i3 = st.columns(3)
     with i1:
-        count = len(df_filtered[df_filtered['Potencial_Valor'].astype(str).str.contains('Diamante|Oro', na=False)])
+        count = motor.contar(selecciones, 'Potencial_Valor', 'Diamante|Oro')
         st.success(f"**Cuentas VIP:**\n\n{count:,} cuentas están en el nivel superior de valor proyectado.")
     with i2:
-        count = len(df_filtered[df_filtered['Segmento_Recompra'].astype(str).str.contains('Muy Alta|Alta', na=False)])
+        count = motor.contar(selecciones, 'Segmento_Recompra', 'Muy Alta|Alta')
         st.info(f"**Venta Próxima:**\n\n{count:,} cuentas tienen propensión alta o muy alta de compra.")
     with i3:
-        count = len(df_filtered[df_filtered['Categoria_Probabilidad_Abandono'].astype(str).str.contains('Alta', na=False)])
+        count = motor.contar(selecciones, 'Categoria_Probabilidad_Abandono', 'Alta')
         st.error(f"**Riesgo Crítico:**\n\n{count:,} cuentas requieren atención inmediata por riesgo de fuga.")
 else:
-    st.error("Archivo no encontrado o vacío.")
\ No newline at end of file
+    st.error("Archivo no encontrado o vacío.")
+
+# --- 9. PERFIL DE RENDER ---
+registro_perfil = perfil.terminar()
+if registro_perfil is not None:
+    perfil_dashboard.registrar(registro_perfil)
+    with st.expander(f"⏱️ Perfil de render: {registro_perfil['total_ms']:,.0f} ms", expanded=False):
+        secciones = pd.DataFrame(registro_perfil["secciones"])
+        st.dataframe(
+            secciones, use_container_width=True, hide_index=True,
+            column_config={
+                "ms": st.column_config.NumberColumn("ms", format="%.1f"),
+                "bytes": st.column_config.NumberColumn("Bytes enviados", format="%d"),
+                "rss_delta_mb": st.column_config.NumberColumn("Δ RSS (MB)", format="%.1f"),
+            }
+        )
+        st.caption(f"{registro_perfil['bytes_total'] / 1024:,.0f} KB enviados · registro en {perfil_dashboard.RUTA_PERFIL}")
\ No newline at end of file
@@ -0,0 +1,600 @@
+import os
+import sys
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from preparacion_datos import derivar_columnas_dashboard, compactar_tipos, leer_manifiesto
+
+# Capa de datos del dashboard, sin dependencia de Streamlit para poder
+# usarla desde scripts, benchmarks y la CLI.
+
+# Rutas donde las deja el pipeline (run_pipeline.py las usa como salidas)
+RUTA_DATASET_POR_DEFECTO = os.path.join("data", "rfm_dashboard.parquet")
+RUTA_MANIFIESTO_POR_DEFECTO = os.path.join("data", "dashboard_actual.json")
+
+RUTA_DATASET = os.environ.get("DASHBOARD_DATASET", RUTA_DATASET_POR_DEFECTO)
+RUTA_DATASET_HEREDADO = 'rfm_churn_ltv.parquet'
+# Manifiesto que publica el pipeline (etapa "publicacion"). Si se fija
+# DASHBOARD_DATASET se usa ese archivo directamente y el manifiesto se ignora.
+RUTA_MANIFIESTO = os.environ.get("DASHBOARD_MANIFIESTO", RUTA_MANIFIESTO_POR_DEFECTO)
+
+# Únicas columnas que usa dashboard.py
+COLUMNAS_DASHBOARD = [
+    'CUENTA',
+    'NEGOCIO',
+    'Segmento_RFM',
+    'Categoria_Probabilidad_Abandono',
+    'Segmento_Recompra',
+    'Potencial_Valor',
+    'Probabilidad_Churn',
+    'Probabilidad_Compra_90d',
+    'Monto_Esperado_90d',
+    'CLV_90dias',
+    'Producto_Recomendado',
+    'Confianza_Recomendacion',
+    'Categoria_Cross_Sell',
+]
+
+
+# --- LECTURA ---
+def _esquema(ruta):
+    # Un archivo o un directorio particionado (particion=<clave>/...)
+    if os.path.isdir(ruta):
+        return ds.dataset(ruta, format="parquet", partitioning="hive").schema
+    return pq.read_schema(ruta)
+
+
+def _leer_columnas(ruta, columnas):
+    # Proyección sobre el Parquet: solo se leen del disco las columnas pedidas.
+    # Los nombres del archivo pueden traer espacios sobrantes.
+    disponibles = {nombre.strip(): nombre for nombre in _esquema(ruta).names}
+    pedidas = [disponibles[c] for c in columnas if c in disponibles]
+    df = pd.read_parquet(ruta, columns=pedidas)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def tipos_dashboard(df):
+    df = compactar_tipos(df)
+    # CUENTA es única por fila: categoría no ahorra nada, texto Arrow sí
+    if 'CUENTA' in df.columns:
+        df['CUENTA'] = df['CUENTA'].astype('string[pyarrow]')
+    return df
+
+
+def cargar_dataset(ruta=RUTA_DATASET, ruta_heredada=RUTA_DATASET_HEREDADO):
+    if os.path.exists(ruta):
+        return tipos_dashboard(_leer_columnas(ruta, COLUMNAS_DASHBOARD))
+
+    # Respaldo: archivo sin finalizar, se derivan las columnas al vuelo
+    df = _leer_columnas(ruta_heredada, COLUMNAS_DASHBOARD)
+    return tipos_dashboard(derivar_columnas_dashboard(df))
+
+
+def _columna_solo_lectura(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        codigos.flags.writeable = False
+        return pd.Series(pd.Categorical.from_codes(codigos, dtype=serie.dtype, validate=False),
+                         index=serie.index, name=serie.name, copy=False)
+    if isinstance(serie.dtype, np.dtype):
+        valores = serie.to_numpy()
+        valores.flags.writeable = False
+        return pd.Series(valores, index=serie.index, name=serie.name, copy=False)
+    # Texto Arrow: los buffers de Arrow ya son inmutables
+    return serie
+
+
+def solo_lectura(df):
+    # El dataset cargado es uno solo para todas las sesiones (st.cache_resource):
+    # con los arreglos de numpy en solo lectura, una escritura sobre él falla
+    # ("assignment destination is read-only") en lugar de cambiarle los datos a
+    # todos. Las vistas no copian los números; las categorías copian sus códigos.
+    # No evita que se reemplace una columna entera: por eso los motores nunca
+    # entregan este DataFrame, solo copias (take) y agregados.
+    return pd.DataFrame({col: _columna_solo_lectura(df[col]) for col in df.columns}, copy=False)
+
+
+def firma_dataset(ruta=RUTA_DATASET, ruta_heredada=RUTA_DATASET_HEREDADO):
+    # Identifica la versión del archivo en disco sin leerlo (clave de caché de los índices)
+    ruta = ruta if os.path.exists(ruta) else ruta_heredada
+    if not os.path.exists(ruta):
+        return None
+    info = os.stat(ruta)
+    return f"{os.path.abspath(ruta)}:{info.st_size}:{info.st_mtime_ns}"
+
+
+_ultimo_manifiesto = {}
+
+
+def version_actual(ruta_manifiesto=RUTA_MANIFIESTO, ruta=RUTA_DATASET, ruta_heredada=RUTA_DATASET_HEREDADO):
+    # {"version", "ruta", "etiqueta", "adjuntos"} del dataset a servir. Se llama en cada rerun: solo
+    # hace un stat del manifiesto y lo relee cuando cambió.
+    if "DASHBOARD_DATASET" not in os.environ:
+        try:
+            info = os.stat(ruta_manifiesto)
+        except OSError:
+            info = None
+        if info is not None:
+            clave = (os.path.abspath(ruta_manifiesto), info.st_size, info.st_mtime_ns)
+            if _ultimo_manifiesto.get("clave") != clave:
+                manifiesto = leer_manifiesto(ruta_manifiesto)
+                if manifiesto is not None:
+                    carpeta = os.path.dirname(os.path.abspath(ruta_manifiesto))
+                    _ultimo_manifiesto.update(clave=clave, version={
+                        "version": manifiesto["version"],
+                        "ruta": os.path.join(carpeta, manifiesto["ruta"]),
+                        "etiqueta": f"{manifiesto['version']} ({manifiesto.get('fecha', 's/f')})",
+                        "adjuntos": {nombre: os.path.join(carpeta, r) for nombre, r in manifiesto.get("adjuntos", {}).items()},
+                    })
+            if _ultimo_manifiesto.get("clave") == clave:
+                return _ultimo_manifiesto["version"]
+
+    # Sin manifiesto (o ilegible): la versión es la firma del archivo
+    firma = firma_dataset(ruta, ruta_heredada)
+    if firma is None:
+        return None
+    return {"version": firma, "ruta": ruta, "etiqueta": os.path.basename(firma.split(":")[0]), "adjuntos": {}}
+
+
+# --- ÍNDICE DE FILTROS (BITMAPS) ---
+# Dimensiones de los multiselect de la barra lateral
+DIMENSIONES_FILTRO = [
+    'Segmento_RFM',
+    'Categoria_Probabilidad_Abandono',
+    'Segmento_Recompra',
+    'Potencial_Valor',
+    'NEGOCIO',
+]
+
+
+class IndiceFiltros:
+    # Un bitmap empaquetado (1 bit por cuenta) por cada valor de cada dimensión.
+    # Filtrar es OR de bitmaps dentro de una dimensión y AND entre dimensiones,
+    # operando sobre N/8 bytes en lugar de evaluar isin sobre N valores.
+
+    def __init__(self, df, dimensiones=DIMENSIONES_FILTRO):
+        self.n = len(df)
+        self.dimensiones = [d for d in dimensiones if d in df.columns]
+        self.bitmaps = {}
+        self.no_nulos = {}
+
+        for dim in self.dimensiones:
+            codigos, valores = pd.factorize(df[dim])  # -1 = nulo
+            self.bitmaps[dim] = {
+                valor: np.packbits(codigos == i) for i, valor in enumerate(valores)
+            }
+            self.no_nulos[dim] = np.packbits(codigos >= 0)
+
+    def nbytes(self):
+        return sum(b.nbytes for bitmaps in self.bitmaps.values() for b in bitmaps.values()) \
+            + sum(b.nbytes for b in self.no_nulos.values())
+
+    def _union(self, dim, seleccion):
+        bitmaps = self.bitmaps[dim]
+        presentes = [v for v in seleccion if v in bitmaps]
+        if len(presentes) == len(bitmaps):
+            # Todo seleccionado: solo quedan fuera los nulos (igual que isin)
+            return self.no_nulos[dim].copy()
+        resultado = np.zeros_like(self.no_nulos[dim])
+        for valor in presentes:
+            np.bitwise_or(resultado, bitmaps[valor], out=resultado)
+        return resultado
+
+    def bitmap(self, selecciones):
+        resultado = None
+        for dim, seleccion in selecciones.items():
+            if dim not in self.bitmaps:
+                continue
+            union = self._union(dim, seleccion)
+            if resultado is None:
+                resultado = union
+            else:
+                np.bitwise_and(resultado, union, out=resultado)
+        if resultado is None:
+            resultado = np.packbits(np.ones(self.n, dtype=bool))
+        return resultado
+
+    def posiciones(self, bitmap):
+        # Posiciones (iloc) de las cuentas marcadas, en orden
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n))
+
+    def filtrar(self, selecciones):
+        return self.posiciones(self.bitmap(selecciones))
+
+
+def en_bitmap(bitmap, filas):
+    # Prueba bit a bit solo las filas dadas: O(len(filas)), no O(cuentas)
+    filas = np.asarray(filas, dtype=np.int64)
+    return ((bitmap[filas >> 3] >> (7 - (filas & 7))) & 1).astype(bool)
+
+
+# --- ÍNDICE DE CUENTAS (BÚSQUEDA) ---
+MODOS_BUSQUEDA = ["Contiene", "Empieza con", "Exacta"]
+
+
+class IndiceCuentas:
+    # Arreglo ordenado de IDs (en minúsculas, como bytes) para búsquedas exactas
+    # y por prefijo con búsqueda binaria, más un índice de trigramas para
+    # subcadenas. El de trigramas se construye en la primera búsqueda que lo usa;
+    # `al_crecer` se llama después, para que el tope de memoria lo cuente.
+
+    def __init__(self, cuentas, al_crecer=None):
+        texto = cuentas.astype(str).str.lower().fillna('').to_numpy(dtype=object)
+        try:
+            valores = texto.astype('S')
+        except UnicodeEncodeError:
+            valores = np.array([t.encode('utf-8') for t in texto], dtype='S')
+        self.orden = np.argsort(valores, kind='stable')
+        self.ordenadas = valores[self.orden]
+        self._trigramas = None
+        self._candado = threading.Lock()
+        self.al_crecer = al_crecer
+
+    def nbytes(self):
+        trigramas = self._trigramas or ()
+        return self.orden.nbytes + self.ordenadas.nbytes + sum(a.nbytes for a in trigramas)
+
+    @staticmethod
+    def _codificar(consulta):
+        return str(consulta).strip().lower().encode('utf-8')
+
+    def _rango_prefijo(self, q):
+        inicio = np.searchsorted(self.ordenadas, q, side='left')
+        # 0xFF nunca aparece en UTF-8: es cota superior de todo lo que empieza con q
+        fin = np.searchsorted(self.ordenadas, q + b'\xff', side='left')
+        return inicio, fin
+
+    def _construir_trigramas(self):
+        n, ancho = len(self.ordenadas), self.ordenadas.dtype.itemsize
+        tipo_fila = np.int32 if n < 2**31 else np.int64
+        if ancho < 3 or n == 0:
+            return np.empty(0, np.uint32), np.zeros(1, np.int32), np.empty(0, tipo_fila)
+        # Vista sin copia de los IDs como matriz de bytes; cada posición se
+        # codifica por separado en uint32 (un trigrama cabe en 24 bits)
+        bytes_ = self.ordenadas.view(np.uint8).reshape(n, ancho)
+        claves = []
+        for p in range(ancho - 2):
+            # El relleno de ceros solo va al final: si el tercer byte existe, el trigrama es real
+            validas = np.flatnonzero(bytes_[:, p + 2] != 0)
+            codigo = ((bytes_[validas, p].astype(np.uint32) << 16)
+                      | (bytes_[validas, p + 1].astype(np.uint32) << 8)
+                      | bytes_[validas, p + 2])
+            claves.append(codigo.astype(np.int64) * n + validas)
+        # Clave única (trigrama, fila): ordena y quita repetidos dentro de la misma cuenta.
+        # Orden + comparación con el vecino (np.unique es mucho más lento aquí)
+        claves = np.concatenate(claves)
+        claves.sort()
+        claves = claves[np.concatenate(([True], claves[1:] != claves[:-1]))]
+        codigos = (claves // n).astype(np.uint32)
+        filas = (claves % n).astype(tipo_fila)
+        del claves
+        inicios = np.flatnonzero(np.concatenate(([True], codigos[1:] != codigos[:-1])))
+        inicios = np.append(inicios, len(filas)).astype(np.int32 if len(filas) < 2**31 else np.int64)
+        return codigos[inicios[:-1]], inicios, filas
+
+    def _filas_trigrama(self, codigo):
+        unicos, inicios, filas = self._trigramas
+        i = np.searchsorted(unicos, codigo)
+        if i == len(unicos) or unicos[i] != codigo:
+            return np.empty(0, np.int64)
+        return filas[inicios[i]:inicios[i + 1]]
+
+    def buscar(self, consulta, modo="Contiene"):
+        # Devuelve posiciones (iloc) en el dataset, ordenadas
+        q = self._codificar(consulta)
+        if not q:
+            return np.empty(0, np.int64)
+
+        if modo == "Exacta":
+            inicio = np.searchsorted(self.ordenadas, q, side='left')
+            fin = np.searchsorted(self.ordenadas, q, side='right')
+            return np.sort(self.orden[inicio:fin])
+        if modo == "Empieza con":
+            inicio, fin = self._rango_prefijo(q)
+            return np.sort(self.orden[inicio:fin])
+
+        if len(q) < 3:
+            # Consulta demasiado corta para trigramas: recorrido vectorizado
+            candidatas = np.arange(len(self.ordenadas))
+        else:
+            construido = False
+            with self._candado:
+                if self._trigramas is None:
+                    self._trigramas = self._construir_trigramas()
+                    construido = True
+            if construido and self.al_crecer is not None:
+                self.al_crecer()
+            listas = sorted(
+                (self._filas_trigrama((q[i] << 16) | (q[i + 1] << 8) | q[i + 2]) for i in range(len(q) - 2)),
+                key=len,
+            )
+            candidatas = listas[0]
+            for lista in listas[1:]:
+                if len(candidatas) == 0:
+                    break
+                candidatas = np.intersect1d(candidatas, lista, assume_unique=True)
+
+        # Los trigramas no garantizan el orden: se confirma la subcadena en las candidatas
+        if len(candidatas):
+            candidatas = candidatas[np.char.find(self.ordenadas[candidatas], q) >= 0]
+        return np.sort(self.orden[candidatas])
+
+
+# --- CUBO DE SEGMENTOS ---
+# Métricas que se suman por celda: (columna, nombre de la suma, nombre del conteo no nulo)
+METRICAS_CUBO = [
+    ('Probabilidad_Churn', 'churn_suma', 'churn_n'),
+    ('CLV_90dias', 'clv_suma', 'clv_n'),
+    ('Probabilidad_Compra_90d', 'compra_suma', 'compra_n'),
+]
+
+
+class CuboSegmentos:
+    # Conteos y sumas agrupados por las dimensiones de filtro. Los KPIs, los
+    # gráficos de composición y las tarjetas de resumen solo dependen de esas
+    # dimensiones, así que se resuelven sumando celdas (cientos) en lugar de
+    # recorrer cuentas (millones).
+
+    def __init__(self, df, dimensiones=DIMENSIONES_FILTRO):
+        self.dimensiones = [d for d in dimensiones if d in df.columns]
+        base = df[self.dimensiones].copy()
+        base['cuentas'] = 1
+        agregaciones = {'cuentas': 'sum'}
+        for col, suma, conteo in METRICAS_CUBO:
+            if col in df.columns:
+                # Sumas en float64 aunque la columna sea float32
+                base[suma] = df[col].astype('float64')
+                base[conteo] = df[col].notna().astype('int64')
+                agregaciones[suma] = 'sum'
+                agregaciones[conteo] = 'sum'
+
+        # Las filas con alguna dimensión nula nunca pasan el filtro: se descartan
+        self.celdas = base.groupby(self.dimensiones, observed=True, dropna=True).agg(agregaciones).reset_index()
+
+    def nbytes(self):
+        return int(self.celdas.memory_usage(deep=True, index=False).sum())
+
+    def celdas_seleccionadas(self, selecciones):
+        mascara = np.ones(len(self.celdas), dtype=bool)
+        for dim, seleccion in selecciones.items():
+            if dim in self.dimensiones:
+                mascara &= self.celdas[dim].isin(seleccion).to_numpy()
+        return self.celdas[mascara]
+
+    def kpis(self, selecciones):
+        celdas = self.celdas_seleccionadas(selecciones)
+
+        def media(suma, conteo):
+            if suma not in celdas or celdas[conteo].sum() == 0:
+                return np.nan
+            return celdas[suma].sum() / celdas[conteo].sum()
+
+        return {
+            'cuentas': int(celdas['cuentas'].sum()),
+            'churn_medio': media('churn_suma', 'churn_n'),
+            'clv_total': float(celdas['clv_suma'].sum()) if 'clv_suma' in celdas else 0.0,
+            'compra_media': media('compra_suma', 'compra_n'),
+        }
+
+    def conteo_por(self, dim, selecciones):
+        celdas = self.celdas_seleccionadas(selecciones)
+        conteo = celdas.groupby(dim, observed=True)['cuentas'].sum()
+        return conteo[conteo > 0].sort_values(ascending=False)
+
+    def contar(self, selecciones, dim, patron):
+        # Equivale a str.contains(patron) sobre las cuentas, evaluado una vez por celda
+        celdas = self.celdas_seleccionadas(selecciones)
+        coincide = celdas[dim].astype(str).str.contains(patron, na=False).to_numpy()
+        return int(celdas.loc[coincide, 'cuentas'].sum())
+
+
+# --- MUESTREO Y DENSIDAD PARA EL SCATTER ---
+PUNTOS_SCATTER = int(os.environ.get("DASHBOARD_PUNTOS_SCATTER", 3000))
+UMBRAL_DENSIDAD = int(os.environ.get("DASHBOARD_UMBRAL_DENSIDAD", 200_000))
+OPCIONES_PUNTOS = sorted({1000, 3000, 5000, 10000, 20000, PUNTOS_SCATTER})
+OUTLIERS_CLV = 50
+SEMILLA_MUESTREO = 42
+
+
+def filas_con_valores(df, filas, columnas):
+    # Posiciones de `filas` sin nulos en `columnas` (equivale a dropna(subset=...))
+    validas = np.ones(len(filas), dtype=bool)
+    for col in columnas:
+        validas &= df[col].notna().to_numpy()[filas]
+    return filas[validas]
+
+
+def top_k(valores, filas, k):
+    # Las k filas con mayor valor, por selección parcial (sin ordenar todo)
+    if k <= 0 or len(filas) == 0:
+        return np.empty(0, dtype=np.int64)
+    v = np.nan_to_num(np.asarray(valores)[filas].astype('float64'), nan=-np.inf)
+    if k >= len(filas):
+        return filas[np.argsort(-v, kind='stable')]
+    parte = np.argpartition(-v, k - 1)[:k]
+    return filas[parte[np.argsort(-v[parte], kind='stable')]]
+
+
+def asignar_cuotas(tamanos, cupo):
+    # Reparto proporcional por mayores restos, al menos un punto por estrato
+    # (si hay más estratos que cupo, sin mínimo). Nunca se pasa del cupo.
+    tamanos = np.asarray(tamanos)
+    minimo = 1 if len(tamanos) <= cupo else 0
+    cuota = cupo * tamanos / tamanos.sum()
+    asignado = np.minimum(np.maximum(np.floor(cuota).astype(int), minimo), tamanos)
+    # Los mínimos de los estratos chicos pueden sumar de más: el exceso sale de las cuotas más grandes
+    while asignado.sum() > cupo:
+        asignado[np.argmax(asignado)] -= 1
+    for i in np.argsort(-(cuota - np.floor(cuota)), kind='stable'):
+        if asignado.sum() >= cupo:
+            break
+        if asignado[i] < tamanos[i]:
+            asignado[i] += 1
+    assert asignado.sum() <= cupo
+    return asignado
+
+
+def muestra_estratificada(df, filas, presupuesto=PUNTOS_SCATTER, estrato='Segmento_Recompra',
+                          col_outliers='CLV_90dias', n_outliers=OUTLIERS_CLV, semilla=SEMILLA_MUESTREO):
+    # Muestra representativa: siempre incluye las cuentas de mayor CLV y reparte
+    # el resto del presupuesto entre estratos en proporción a su tamaño.
+    # Misma selección + misma semilla = mismos puntos en cada rerun.
+    if len(filas) <= presupuesto:
+        return filas
+
+    outliers = top_k(df[col_outliers].to_numpy(), filas, min(n_outliers, presupuesto)) \
+        if col_outliers in df.columns else np.empty(0, dtype=np.int64)
+    resto = np.setdiff1d(filas, outliers, assume_unique=True)
+    cupo = presupuesto - len(outliers)
+
+    codigos = pd.factorize(df[estrato].take(resto))[0] if estrato in df.columns else np.zeros(len(resto), int)
+    estratos, tamanos = np.unique(codigos, return_counts=True)
+    asignado = asignar_cuotas(tamanos, cupo)
+
+    rng = np.random.default_rng(semilla)
+    elegidas = [outliers]
+    for codigo, n in zip(estratos, asignado):
+        miembros = resto[codigos == codigo]
+        elegidas.append(rng.choice(miembros, size=n, replace=False))
+    return np.sort(np.concatenate(elegidas))
+
+
+def rangos_densidad(x_min, x_max, y_min, y_tope):
+    # Ejes del mapa de densidad: X cubre al menos [0, 1], Y arranca en 0 o menos
+    return min(x_min, 0.0), max(x_max, 1.0), min(y_min, 0.0), max(y_tope, 1e-9)
+
+
+def celdas_densidad(valores, minimo, maximo, bins):
+    # Celda de cada valor; el máximo cae en la última. Es la misma fórmula que
+    # usa el backend DuckDB en SQL, así ambos producen exactamente el mismo mapa.
+    celda = np.floor((valores - minimo) / (maximo - minimo) * bins)
+    return np.minimum(celda, bins - 1).astype(np.int64)
+
+
+def densidad_2d(x, y, bins=60, percentil_y=99.5):
+    # Histograma 2D vectorizado. El eje Y se recorta en un percentil alto para
+    # que unas cuantas cuentas extremas no aplasten el resto en una sola franja
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if len(x) == 0:
+        return np.zeros((bins, bins)), np.zeros(bins), np.zeros(bins)
+    tope = np.percentile(y, percentil_y)
+    x0, x1, y0, y1 = rangos_densidad(x.min(), x.max(), y.min(), tope)
+    cx = celdas_densidad(x, x0, x1, bins)
+    cy = celdas_densidad(np.minimum(y, tope), y0, y1, bins)
+    conteos = np.bincount(cy * bins + cx, minlength=bins * bins).reshape(bins, bins)
+    return conteos, centros_densidad(x0, x1, bins), centros_densidad(y0, y1, bins)
+
+
+def centros_densidad(minimo, maximo, bins):
+    bordes = np.linspace(minimo, maximo, bins + 1)
+    return (bordes[:-1] + bordes[1:]) / 2
+
+
+# --- TABLA PAGINADA ---
+# Columnas por las que se puede ordenar la tabla (etiqueta visible -> columna)
+COLUMNAS_ORDEN = {
+    "Orden original": None,
+    "Valor Proyectado": 'CLV_90dias',
+    "Confianza Recomendación": 'Confianza_Recomendacion',
+    "Probabilidad Churn": 'Probabilidad_Churn',
+    "Probabilidad Compra": 'Probabilidad_Compra_90d',
+    "Monto Esperado": 'Monto_Esperado_90d',
+    "Cuenta": 'CUENTA',
+}
+TAMANOS_PAGINA = [25, 50, 100, 250]
+
+
+class OrdenesTabla:
+    # Rango global de cada cuenta por columna y sentido (nulos siempre al final),
+    # calculado la primera vez que se pide y compartido entre sesiones. Con el
+    # rango, ordenar cualquier selección es una selección parcial de k filas.
+    # `al_crecer` se llama tras calcular cada rango, para que el tope de memoria lo cuente.
+
+    def __init__(self, df, al_crecer=None):
+        self.df = df
+        self._rangos = {}
+        self._candado = threading.Lock()
+        self.al_crecer = al_crecer
+
+    def nbytes(self):
+        with self._candado:
+            return sum(r.nbytes for r in self._rangos.values())
+
+    def rango(self, columna, descendente):
+        clave = (columna, descendente)
+        construido = False
+        with self._candado:
+            if clave not in self._rangos:
+                r = self.df[columna].rank(method='first', ascending=not descendente, na_option='bottom')
+                self._rangos[clave] = r.to_numpy(dtype=np.int64) - 1
+                construido = True
+        if construido and self.al_crecer is not None:
+            self.al_crecer()
+        return self._rangos[clave]
+
+    def pagina(self, filas, columna, descendente, pagina, tam_pagina):
+        # Solo las posiciones de la página pedida
+        inicio = pagina * tam_pagina
+        fin = min(inicio + tam_pagina, len(filas))
+        if inicio >= fin:
+            return np.empty(0, dtype=np.int64)
+        if columna is None:
+            return filas[inicio:fin]
+
+        r = self.rango(columna, descendente)[filas]
+        if fin < len(filas):
+            # Top-k: argpartition deja las `fin` primeras al frente en O(n)
+            primeras = np.argpartition(r, fin - 1)[:fin]
+        else:
+            primeras = np.arange(len(filas))
+        primeras = primeras[np.argsort(r[primeras], kind='stable')]
+        return filas[primeras[inicio:fin]]
+
+
+# --- REPORTE DE MEMORIA ---
+def reporte_memoria(df_antes, df_despues):
+    antes = df_antes.memory_usage(deep=True, index=False)
+    despues = df_despues.memory_usage(deep=True, index=False)
+    reporte = pd.DataFrame({
+        'tipo_antes': df_antes.dtypes.astype(str),
+        'bytes_antes': antes,
+        'tipo_despues': df_despues.dtypes.astype(str).reindex(antes.index).fillna('(no se carga)'),
+        'bytes_despues': despues.reindex(antes.index),
+    })
+    reporte['bytes_despues'] = reporte['bytes_despues'].fillna(0).astype('int64')
+    reporte.loc['TOTAL'] = ['', antes.sum(), '', despues.sum()]
+    reporte['ahorro'] = 1 - reporte['bytes_despues'] / reporte['bytes_antes']
+    return reporte
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memoria por columna: dataset completo vs. carga del dashboard")
+    parser.add_argument("ruta", nargs="?", default=RUTA_DATASET, help="Parquet a analizar")
+    args = parser.parse_args(argv)
+
+    # "Antes": todas las columnas con los tipos por defecto de pandas
+    completo = pd.read_parquet(args.ruta)
+    for col in completo.columns:
+        if pd.api.types.is_float_dtype(completo[col]):
+            completo[col] = completo[col].astype('float64')
+        elif not pd.api.types.is_numeric_dtype(completo[col]):
+            completo[col] = completo[col].astype(object)
+
+    reporte = reporte_memoria(completo, cargar_dataset(args.ruta))
+    with pd.option_context('display.max_rows', None, 'display.width', 140):
+        print(reporte.to_string(formatters={
+            'bytes_antes': '{:,.0f}'.format,
+            'bytes_despues': '{:,.0f}'.format,
+            'ahorro': '{:.1%}'.format,
+        }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
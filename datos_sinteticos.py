@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import preparacion_datos
+
+# Cartera sintética con la forma de rfm_churn_ltv (la salida de los notebooks),
+# para medir el dashboard sin datos reales. Las proporciones imitan una cartera
+# real: pocos Campeones y muchas cuentas dormidas, un negocio dominante, un
+# puñado de productos que concentran las recomendaciones y CLV de cola larga.
+# Se genera por lotes (memoria acotada) y de forma determinista por semilla.
+
+CARPETA_SINTETICOS = os.path.join("data", "sinteticos")
+TAMANOS = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+SEMILLA = 7
+TAM_LOTE = 1_000_000
+# Desde este tamaño el dataset del dashboard se finaliza particionado
+PARTICIONAR_DESDE = 5_000_000
+
+# Segmento: (peso, churn beta (a, b), propensión beta (a, b), monto log-normal mu)
+SEGMENTOS_RFM = {
+    'Campeones': (1.5, (1.2, 9.0), (6.0, 2.0), 7.2),
+    'VIPs Leales': (2.0, (1.5, 8.0), (5.0, 2.5), 7.0),
+    'Alto Potencial': (2.5, (2.0, 7.0), (4.0, 3.0), 6.8),
+    'VIPs Potenciales': (2.0, (2.0, 6.0), (4.0, 3.0), 6.7),
+    'Calidad Reciente': (3.0, (2.0, 6.0), (4.0, 3.5), 6.3),
+    'Nuevos Grandes Compradores': (1.5, (2.5, 5.0), (3.5, 3.5), 6.9),
+    'Calidad Regular': (4.0, (2.5, 5.0), (3.0, 4.0), 6.0),
+    'Estándar Reciente': (5.0, (2.5, 5.0), (3.0, 4.0), 5.6),
+    'Estándar': (9.0, (3.0, 4.0), (2.5, 4.5), 5.4),
+    'Calidad Prometedora': (3.5, (3.0, 4.5), (3.0, 4.0), 5.8),
+    'Alto Riesgo - Valiosos': (2.0, (6.0, 2.5), (2.0, 5.0), 6.6),
+    'Nuevos Clientes': (6.0, (3.0, 4.0), (2.5, 4.0), 5.0),
+    'Bajo Compromiso': (7.0, (4.0, 3.0), (1.8, 5.0), 4.8),
+    'Pasivos': (9.0, (5.0, 2.5), (1.5, 6.0), 4.6),
+    'Críticos a Retener': (2.5, (7.0, 2.0), (2.0, 5.0), 6.2),
+    'Necesitan Atención': (5.0, (4.5, 3.0), (2.0, 5.0), 5.2),
+    'En Riesgo': (6.0, (6.0, 2.5), (1.5, 6.0), 5.0),
+    'Baja Prioridad': (8.0, (5.0, 3.0), (1.2, 7.0), 4.2),
+    'A Punto de Dormir': (6.0, (7.0, 2.0), (1.2, 7.0), 4.5),
+    'Hibernando': (14.5, (9.0, 1.5), (1.0, 9.0), 4.0),
+}
+NEGOCIOS = {'Retail': 55, 'Mayoreo': 20, 'E-commerce': 14, 'Corporativo': 8, 'Franquicias': 3}
+CATEGORIAS_CROSS_SELL = {'Hogar': 28, 'Electrónica': 22, 'Moda': 17, 'Belleza': 11, 'Deportes': 9,
+                         'Alimentos': 7, 'Juguetería': 4, 'Ferretería': 2}
+PRODUCTOS = 40
+# Cortes de Probabilidad_Churn -> Categoria_Probabilidad_Abandono
+CORTES_ABANDONO = [0.2, 0.4, 0.6, 0.8]
+CATEGORIAS_ABANDONO = ['Muy baja', 'Baja', 'Media', 'Alta', 'Muy alta']
+# Fracción de cuentas sin score en las columnas que los notebooks dejan vacías
+NULOS = {'Probabilidad_Compra_90d': 0.015, 'Monto_Esperado_90d': 0.015, 'CLV_90dias': 0.01}
+
+
+def _pesos(valores):
+    p = np.asarray(valores, dtype=float)
+    return p / p.sum()
+
+
+def _categoria(codigos, etiquetas):
+    return pa.DictionaryArray.from_arrays(pa.array(codigos, pa.int32()), pa.array(etiquetas, pa.string())).cast(pa.string())
+
+
+def _con_nulos(rng, valores, fraccion):
+    return pa.array(valores, pa.float64(), mask=rng.random(len(valores)) < fraccion)
+
+
+def generar_lote(rng, inicio, filas):
+    nombres = list(SEGMENTOS_RFM)
+    perfiles = list(SEGMENTOS_RFM.values())
+    seg = rng.choice(len(nombres), filas, p=_pesos([p[0] for p in perfiles]))
+
+    churn = np.empty(filas)
+    compra = np.empty(filas)
+    mu = np.empty(filas)
+    for i, (_, (ca, cb), (pa_, pb), m) in enumerate(perfiles):
+        en = seg == i
+        n = int(en.sum())
+        churn[en] = rng.beta(ca, cb, n)
+        compra[en] = rng.beta(pa_, pb, n)
+        mu[en] = m
+    monto = rng.lognormal(mu, 1.0)
+    clv = compra * monto * 1.8 * rng.lognormal(0.0, 0.35, filas)
+
+    # IDs únicos de 10 dígitos, desordenados dentro del lote como en un export real
+    ids = pc.cast(pa.array(rng.permutation(np.arange(inicio, inicio + filas)) + 1, pa.int64()), pa.string())
+    productos = [f"Producto {i:02d}" for i in range(1, PRODUCTOS + 1)]
+
+    return pa.table({
+        'CUENTA': pc.utf8_lpad(ids, 10, "0"),
+        'NEGOCIO': _categoria(rng.choice(len(NEGOCIOS), filas, p=_pesos(list(NEGOCIOS.values()))), list(NEGOCIOS)),
+        'Segmento_RFM': _categoria(seg, nombres),
+        'Probabilidad_Churn': pa.array(churn),
+        'Categoria_Probabilidad_Abandono': _categoria(np.searchsorted(CORTES_ABANDONO, churn), CATEGORIAS_ABANDONO),
+        'Probabilidad_Compra_90d': _con_nulos(rng, compra, NULOS['Probabilidad_Compra_90d']),
+        'Monto_Esperado_90d': _con_nulos(rng, monto, NULOS['Monto_Esperado_90d']),
+        'CLV_90dias': _con_nulos(rng, clv, NULOS['CLV_90dias']),
+        # Zipf: unos pocos productos concentran la mayoría de las recomendaciones
+        'Producto_Recomendado': _categoria(rng.choice(PRODUCTOS, filas, p=_pesos(1 / np.arange(1, PRODUCTOS + 1) ** 1.1)),
+                                           productos),
+        'Confianza_Recomendacion': pa.array(rng.beta(5, 3, filas)),
+        'Categoria_Cross_Sell': _categoria(rng.choice(len(CATEGORIAS_CROSS_SELL), filas,
+                                                      p=_pesos(list(CATEGORIAS_CROSS_SELL.values()))),
+                                           list(CATEGORIAS_CROSS_SELL)),
+    })
+
+
+def generar(filas, ruta_salida, semilla=SEMILLA, tam_lote=TAM_LOTE):
+    temporal = f"{ruta_salida}.tmp"
+    escritor = None
+    try:
+        for i, inicio in enumerate(range(0, filas, tam_lote)):
+            # Una semilla por lote: el resultado no depende de cuántos lotes se hayan generado antes
+            lote = generar_lote(np.random.default_rng([semilla, i]), inicio, min(tam_lote, filas - inicio))
+            if escritor is None:
+                escritor = pq.ParquetWriter(temporal, lote.schema, compression="zstd", write_statistics=True)
+            escritor.write_table(lote)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    os.replace(temporal, ruta_salida)
+
+
+def filas_de(tamano):
+    # "1m", "100k" o un número
+    return TAMANOS[tamano.lower()] if str(tamano).lower() in TAMANOS else int(tamano)
+
+
+def rutas(tamano, carpeta=CARPETA_SINTETICOS):
+    etiqueta = str(tamano).lower()
+    crudo = os.path.join(carpeta, f"rfm_churn_ltv_{etiqueta}.parquet")
+    if filas_de(tamano) >= PARTICIONAR_DESDE:
+        return crudo, os.path.join(carpeta, f"rfm_dashboard_{etiqueta}")
+    return crudo, os.path.join(carpeta, f"rfm_dashboard_{etiqueta}.parquet")
+
+
+def preparar(tamano, carpeta=CARPETA_SINTETICOS, forzar=False, semilla=SEMILLA):
+    # Genera la cartera y la finaliza con el mismo código que el pipeline.
+    # Devuelve la ruta lista para el dashboard; si ya existe, no se regenera.
+    filas = filas_de(tamano)
+    crudo, final = rutas(tamano, carpeta)
+    os.makedirs(carpeta, exist_ok=True)
+    if forzar or not os.path.exists(crudo):
+        inicio = time.perf_counter()
+        generar(filas, crudo, semilla)
+        print(f"{filas:,} cuentas generadas en {time.perf_counter() - inicio:.1f} s -> {crudo}")
+    if forzar or not os.path.exists(final):
+        inicio = time.perf_counter()
+        if filas >= PARTICIONAR_DESDE:
+            preparacion_datos.finalizar_dataset_particionado(crudo, final)
+        else:
+            preparacion_datos.finalizar_dataset(crudo, final)
+        print(f"Dataset del dashboard en {time.perf_counter() - inicio:.1f} s -> {final}")
+    return final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera carteras sintéticas con la forma de rfm_churn_ltv")
+    parser.add_argument("tamanos", nargs="+", help=f"Cuentas: {', '.join(TAMANOS)} o un número")
+    parser.add_argument("--carpeta", default=CARPETA_SINTETICOS, help="Carpeta de salida")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--forzar", action="store_true", help="Regenerar aunque ya existan")
+    args = parser.parse_args(argv)
+
+    for tamano in args.tamanos:
+        preparar(tamano, args.carpeta, forzar=args.forzar, semilla=args.semilla)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import io
+import os
+import json
+import traceback
+from contextlib import redirect_stdout
+from datetime import datetime
+
+# Ejecuta las celdas de código de un notebook dentro del proceso actual, sin
+# lanzar un kernel de Jupyter. pandas, sklearn y compañía se importan una sola
+# vez para todas las etapas (quedan en sys.modules) y los notebooks pueden
+# tomar DataFrames de etapas anteriores desde `memoria_pipeline` en lugar de
+# releerlos del disco. Cada notebook corre en su propio espacio de nombres.
+#
+# Limitaciones frente a papermill: no hay IPython, así que las líneas con
+# magias (%...) o comandos de shell (!...) se omiten, y no se muestra el valor
+# de la última expresión de cada celda (solo lo que se imprime).
+
+
+def _fuente(celda):
+    fuente = celda.get("source", "")
+    return "".join(fuente) if isinstance(fuente, list) else fuente
+
+
+def _sin_magias(codigo):
+    lineas = []
+    for linea in codigo.splitlines():
+        recortada = linea.lstrip()
+        if recortada.startswith(("%", "!")):
+            sangria = linea[:len(linea) - len(recortada)]
+            linea = f"{sangria}pass  # omitido fuera de Jupyter: {recortada}"
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+
+def _celda_parametros(parametros):
+    codigo = "# Parámetros inyectados\n" + "".join(f"{k} = {v!r}\n" for k, v in parametros.items())
+    return {"cell_type": "code", "execution_count": None, "metadata": {"tags": ["injected-parameters"]},
+            "outputs": [], "source": codigo}
+
+
+def _salida_texto(texto):
+    return {"output_type": "stream", "name": "stdout", "text": texto}
+
+
+def ejecutar_notebook_en_proceso(ruta_input, ruta_salida, parametros=None, memoria=None):
+    with open(ruta_input, encoding="utf-8") as f:
+        nb = json.load(f)
+    parametros = parametros or {}
+
+    # Como papermill: los parámetros van justo después de la celda etiquetada
+    # "parameters", o al principio si no hay ninguna
+    celdas = nb.get("cells", [])
+    posicion = next((i + 1 for i, c in enumerate(celdas)
+                     if "parameters" in c.get("metadata", {}).get("tags", [])), 0)
+    if parametros:
+        celdas.insert(posicion, _celda_parametros(parametros))
+    nb["cells"] = celdas
+
+    nombre = os.path.basename(ruta_input)
+    espacio = {"__name__": "__main__", "memoria_pipeline": memoria if memoria is not None else {},
+               "display": lambda *objs, **kw: print(*objs)}
+    contador = 0
+    try:
+        for i, celda in enumerate(celdas):
+            if celda.get("cell_type") != "code":
+                continue
+            contador += 1
+            celda["execution_count"] = contador
+            celda["outputs"] = []
+            salida = io.StringIO()
+            try:
+                with redirect_stdout(salida):
+                    exec(compile(_sin_magias(_fuente(celda)), f"<{nombre}, celda {i}>", "exec"), espacio)
+            except Exception as e:
+                celda["outputs"].append(_salida_texto(salida.getvalue()))
+                celda["outputs"].append({"output_type": "error", "ename": type(e).__name__, "evalue": str(e),
+                                         "traceback": traceback.format_exc().splitlines()})
+                raise RuntimeError(f"{nombre}, celda {i}: {type(e).__name__}: {e}") from e
+            if salida.getvalue():
+                celda["outputs"].append(_salida_texto(salida.getvalue()))
+    finally:
+        # El notebook ejecutado (con salidas o con el error) va a otra carpeta: el original no se toca
+        nb.setdefault("metadata", {})["ejecucion"] = {
+            "modo": "proceso",
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "parametros": parametros,
+        }
+        os.makedirs(os.path.dirname(ruta_salida) or ".", exist_ok=True)
+        temporal = f"{ruta_salida}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(nb, f, indent=1, ensure_ascii=False)
+        os.replace(temporal, ruta_salida)
@@ -0,0 +1,160 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from preparacion_datos import leer_manifiesto, tabla_en_memoria, VALORES_NULOS
+
+# Modo incremental del pipeline (run_pipeline.py --delta <transacciones>).
+# Solo se vuelven a puntuar las cuentas que aparecen en el delta:
+#   1. "afectadas": cuentas únicas del delta de transacciones,
+#   2. los notebooks reciben el parámetro `cuentas_afectadas` (ruta a ese
+#      Parquet) y escriben filas solo para esas cuentas, con los modelos ya
+#      entrenados y la misma fecha de referencia que la corrida completa,
+#   3. "fusion": las filas nuevas reemplazan a las de esas cuentas en la salida
+#      de la versión publicada anterior; el resto se copia tal cual.
+# Después la finalización, las audiencias y la publicación corren como siempre
+# sobre la cartera completa (los cuartiles dependen de toda la cartera).
+# La reconstrucción completa (sin --delta) sigue siendo la referencia:
+# `python incremental.py comparar` verifica que ambas coincidan.
+
+RUTA_CUENTAS_AFECTADAS = os.path.join("data", "cuentas_afectadas.parquet")
+# Salida de la etapa "parquet" en modo incremental: solo las cuentas afectadas
+RUTA_PARQUET_CAMBIOS = os.path.join("data", "rfm_churn_ltv_cambios.parquet")
+# Adjunto de cada versión publicada que sirve de base a la siguiente fusión
+NOMBRE_BASE = "rfm_churn_ltv.parquet"
+
+TOLERANCIA = 1e-9
+
+
+def _columna(nombres, buscada):
+    # Los nombres del archivo pueden traer espacios sobrantes
+    for nombre in nombres:
+        if nombre.strip() == buscada:
+            return nombre
+    raise KeyError(f"No se encontró la columna {buscada}")
+
+
+# --- ETAPA "afectadas" ---
+def identificar_afectadas(ruta_delta, ruta_salida):
+    if ruta_delta.endswith(".csv"):
+        nombre = _columna(pd.read_csv(ruta_delta, nrows=0, encoding="utf-8-sig").columns, 'CUENTA')
+        cuentas = pd.read_csv(ruta_delta, usecols=[nombre], dtype={nombre: str},
+                              na_values=VALORES_NULOS, encoding="utf-8-sig")[nombre]
+    else:
+        nombre = _columna(pq.read_schema(ruta_delta).names, 'CUENTA')
+        cuentas = pd.read_parquet(ruta_delta, columns=[nombre])[nombre].astype("string")
+    cuentas = np.sort(cuentas.dropna().astype(str).unique())
+
+    temporal = f"{ruta_salida}.tmp"
+    pq.write_table(pa.table({'CUENTA': pa.array(cuentas, pa.string())}), temporal, compression="zstd")
+    os.replace(temporal, ruta_salida)
+    print(f"{len(cuentas):,} cuentas afectadas en {os.path.basename(ruta_delta)}")
+
+
+# --- ETAPA "fusion" ---
+def ruta_base(ruta_manifiesto):
+    # Salida completa de la última versión publicada
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    relativa = (manifiesto or {}).get("adjuntos", {}).get(NOMBRE_BASE)
+    if relativa is None:
+        raise FileNotFoundError(f"No hay una versión publicada con {NOMBRE_BASE} en {ruta_manifiesto}; "
+                                f"ejecuta primero el pipeline completo (sin --delta).")
+    return os.path.join(os.path.dirname(os.path.abspath(ruta_manifiesto)), relativa)
+
+
+def fusionar_con_version(ruta_cambios, ruta_afectadas, ruta_base, ruta_salida, memoria=None):
+    # Con el runner "proceso" los cambios llegan en memoria desde la etapa
+    # "parquet" y la fusión queda en memoria para la finalización
+    base = pq.read_table(ruta_base)
+    cambios = tabla_en_memoria(memoria, ruta_cambios)
+    if cambios is None:
+        cambios = pq.read_table(ruta_cambios)
+    faltantes = set(base.column_names) - set(cambios.column_names)
+    if faltantes:
+        raise ValueError(f"La salida incremental no trae las columnas: {sorted(faltantes)}")
+    # Con pocas filas la inferencia del CSV puede elegir otros tipos: manda la base
+    cambios = cambios.select(base.column_names).cast(base.schema)
+
+    # Se reemplazan las afectadas (aunque el notebook no las haya devuelto, como
+    # en una corrida completa) y cualquier cuenta que venga en los cambios
+    col_cuenta = _columna(base.column_names, 'CUENTA')
+    reemplazadas = pa.chunked_array([pq.read_table(ruta_afectadas).column('CUENTA'),
+                                     cambios.column(col_cuenta)]).unique()
+    conservar = pc.invert(pc.is_in(base.column(col_cuenta), value_set=reemplazadas))
+    conservadas = base.filter(pc.fill_null(conservar, True))
+
+    fusion = pa.concat_tables([conservadas, cambios])
+    temporal = f"{ruta_salida}.tmp"
+    pq.write_table(fusion, temporal, compression="zstd", write_statistics=True)
+    os.replace(temporal, ruta_salida)
+    if memoria is not None:
+        memoria[ruta_salida] = fusion
+    print(f"{conservadas.num_rows:,} filas sin cambios + {cambios.num_rows:,} repuntuadas "
+          f"({base.num_rows - conservadas.num_rows:,} reemplazadas)")
+
+
+# --- VERIFICACIÓN ---
+def _leer_para_comparar(ruta):
+    df = pd.read_parquet(ruta)
+    df.columns = df.columns.str.strip()
+    df = df.drop(columns=[c for c in ('particion',) if c in df.columns])
+    df['CUENTA'] = df['CUENTA'].astype(str)
+    return df.set_index('CUENTA').sort_index()
+
+
+def comparar_datasets(ruta_a, ruta_b, tolerancia=TOLERANCIA):
+    # Misma cartera, mismas columnas y mismos valores por cuenta (el orden de las filas no importa)
+    a, b = _leer_para_comparar(ruta_a), _leer_para_comparar(ruta_b)
+    diferencias = {}
+    if set(a.columns) != set(b.columns):
+        diferencias["columnas"] = sorted(set(a.columns) ^ set(b.columns))
+    solo_a, solo_b = a.index.difference(b.index), b.index.difference(a.index)
+    if len(solo_a) or len(solo_b):
+        diferencias["cuentas"] = {"solo_a": len(solo_a), "solo_b": len(solo_b)}
+
+    comunes = a.index.intersection(b.index)
+    for col in sorted(set(a.columns) & set(b.columns)):
+        x, y = a.loc[comunes, col], b.loc[comunes, col]
+        if pd.api.types.is_numeric_dtype(x) and pd.api.types.is_numeric_dtype(y):
+            x, y = x.to_numpy(dtype=float), y.to_numpy(dtype=float)
+            iguales = np.isclose(x, y, rtol=tolerancia, atol=0, equal_nan=True)
+        else:
+            x, y = x.astype(object), y.astype(object)
+            iguales = (x.isna() & y.isna()).to_numpy() | (x.astype(str) == y.astype(str)).to_numpy()
+        if not iguales.all():
+            diferencias.setdefault("valores", {})[col] = int((~iguales).sum())
+    return diferencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilidades del modo incremental del pipeline")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    afectadas = sub.add_parser("afectadas", help="Lista las cuentas de un delta de transacciones")
+    afectadas.add_argument("delta", help="CSV o Parquet con una columna CUENTA")
+    comparar = sub.add_parser("comparar", help="Compara dos datasets por cuenta (incremental vs completo)")
+    comparar.add_argument("a")
+    comparar.add_argument("b")
+    comparar.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                          help="Diferencia relativa admitida en columnas numéricas")
+    args = parser.parse_args(argv)
+
+    if args.comando == "afectadas":
+        identificar_afectadas(args.delta, RUTA_CUENTAS_AFECTADAS)
+        print(f"Escrito: {RUTA_CUENTAS_AFECTADAS}")
+        return 0
+
+    diferencias = comparar_datasets(args.a, args.b, args.tolerancia)
+    if not diferencias:
+        print("Sin diferencias.")
+        return 0
+    print(f"Diferencias: {diferencias}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
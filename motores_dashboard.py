@@ -0,0 +1,434 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+import datos_dashboard
+from datos_dashboard import (
+    DIMENSIONES_FILTRO, OUTLIERS_CLV, PUNTOS_SCATTER, SEMILLA_MUESTREO,
+    asignar_cuotas, centros_densidad, rangos_densidad,
+)
+
+# DuckDB es opcional: solo lo necesita el motor fuera de memoria
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Motores de consulta del dashboard. Ambos responden las mismas preguntas
+# (KPIs, conteos, scatter, página de tabla) a partir de las selecciones de la
+# barra lateral; dashboard.py no toca el DataFrame directamente.
+#   memoria: dataset cargado en el proceso, con índices y cubo (datos_dashboard.py)
+#   duckdb:  consulta el Parquet (archivo o carpeta particionada) en disco
+MOTOR = os.environ.get("DASHBOARD_MOTOR", "memoria").strip().lower()
+MOTORES = ["memoria", "duckdb"]
+
+COLUMNA_X = 'Probabilidad_Compra_90d'
+COLUMNA_Y = 'Monto_Esperado_90d'
+COLUMNA_CLV = 'CLV_90dias'
+ESTRATO_SCATTER = 'Segmento_Recompra'
+COLUMNAS_SCATTER = [
+    'CUENTA', 'Probabilidad_Compra_90d', 'Monto_Esperado_90d', 'CLV_90dias',
+    'Segmento_Recompra', 'Segmento_RFM', 'Categoria_Probabilidad_Abandono',
+]
+
+
+def _clave(selecciones):
+    return tuple(sorted((dim, tuple(sorted(map(str, sel)))) for dim, sel in selecciones.items()))
+
+
+# --- MOTOR EN MEMORIA ---
+class MotorMemoria:
+    # Envuelve los índices en memoria. El bitmap de las últimas selecciones se
+    # guarda para que las consultas de un mismo rerun no lo recalculen.
+    # Los rangos de orden y el índice de búsqueda se construyen al primer uso;
+    # entonces se llama `al_crecer` (el gestor de versiones revisa su tope).
+
+    def __init__(self, df, memo=4):
+        self.df = datos_dashboard.solo_lectura(df)
+        self.columnas = list(df.columns)
+        self.al_crecer = None
+        self.indice_filtros = datos_dashboard.IndiceFiltros(self.df)
+        self.cubo = datos_dashboard.CuboSegmentos(self.df)
+        self.ordenes = datos_dashboard.OrdenesTabla(self.df, al_crecer=self._crecio)
+        self._indice_cuentas = None
+        self._memo = OrderedDict()
+        self._tam_memo = memo
+        self._candado = threading.Lock()
+
+    def _crecio(self):
+        if self.al_crecer is not None:
+            self.al_crecer()
+
+    def nbytes(self):
+        # Dataset, índices, cubo y estructuras construidas al primer uso
+        total = self.df.memory_usage(deep=True, index=False).sum() + self.indice_filtros.nbytes() \
+            + self.cubo.nbytes() + self.ordenes.nbytes()
+        with self._candado:
+            if self._indice_cuentas is not None:
+                total += self._indice_cuentas.nbytes()
+            total += sum(a.nbytes for entrada in self._memo.values() for a in entrada)
+        return int(total)
+
+    def opciones(self, dim):
+        return sorted(self.df[dim].dropna().unique().tolist()) if dim in self.df.columns else []
+
+    def _seleccion(self, selecciones):
+        clave = _clave(selecciones)
+        with self._candado:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                return self._memo[clave]
+        bitmap = self.indice_filtros.bitmap(selecciones)
+        filas = self.indice_filtros.posiciones(bitmap)
+        scatter = datos_dashboard.filas_con_valores(self.df, filas, [COLUMNA_X, COLUMNA_Y])
+        with self._candado:
+            self._memo[clave] = (bitmap, filas, scatter)
+            while len(self._memo) > self._tam_memo:
+                self._memo.popitem(last=False)
+        return bitmap, filas, scatter
+
+    def kpis(self, selecciones):
+        return self.cubo.kpis(selecciones)
+
+    def conteo_por(self, dim, selecciones):
+        return self.cubo.conteo_por(dim, selecciones)
+
+    def contar(self, selecciones, dim, patron):
+        return self.cubo.contar(selecciones, dim, patron)
+
+    def total_scatter(self, selecciones):
+        return len(self._seleccion(selecciones)[2])
+
+    def muestra_scatter(self, selecciones, presupuesto=PUNTOS_SCATTER):
+        filas = self._seleccion(selecciones)[2]
+        return self.df.take(datos_dashboard.muestra_estratificada(self.df, filas, presupuesto=presupuesto))
+
+    def densidad(self, selecciones, bins=60):
+        filas = self._seleccion(selecciones)[2]
+        conteos, centros_x, centros_y = datos_dashboard.densidad_2d(
+            self.df[COLUMNA_X].to_numpy()[filas], self.df[COLUMNA_Y].to_numpy()[filas], bins=bins)
+        outliers = datos_dashboard.top_k(self.df[COLUMNA_CLV].to_numpy(), filas, OUTLIERS_CLV)
+        return conteos, centros_x, centros_y, self.df.take(outliers)
+
+    def pagina_tabla(self, selecciones, busqueda, modo, columna, descendente, pagina, tam_pagina, columnas):
+        bitmap, filas, _ = self._seleccion(selecciones)
+        if busqueda:
+            construido = False
+            with self._candado:
+                if self._indice_cuentas is None:
+                    self._indice_cuentas = datos_dashboard.IndiceCuentas(self.df['CUENTA'], al_crecer=self._crecio)
+                    construido = True
+            if construido:
+                self._crecio()
+            encontradas = self._indice_cuentas.buscar(busqueda, modo)
+            filas = encontradas[datos_dashboard.en_bitmap(bitmap, encontradas)]
+        pagina_filas = self.ordenes.pagina(filas, columna, descendente, pagina, tam_pagina)
+        return self.df.take(pagina_filas)[[c for c in columnas if c in self.columnas]], len(filas)
+
+
+# --- MOTOR DUCKDB (FUERA DE MEMORIA) ---
+class MotorDuckDB:
+    # Las selecciones se traducen a predicados WHERE que DuckDB empuja al
+    # lector de Parquet (poda por estadísticas de row group y por particiones
+    # Hive). Solo viajan al proceso agregados, la muestra y la página visible.
+    # El orden original es (archivo, fila dentro del archivo), que coincide con
+    # el orden del DataFrame en memoria; así los desempates son los mismos.
+
+    def __init__(self, ruta=datos_dashboard.RUTA_DATASET, memoria_max=None, hilos=None):
+        if duckdb is None:
+            raise ImportError("El motor 'duckdb' requiere el paquete duckdb (pip install duckdb)")
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No existe el dataset del dashboard: {ruta}")
+
+        patron = os.path.join(ruta, "**", "*.parquet") if os.path.isdir(ruta) else ruta
+        self.con = duckdb.connect()
+        memoria_max = memoria_max or os.environ.get("DASHBOARD_DUCKDB_MEMORIA")
+        if memoria_max:
+            self.con.execute(f"SET memory_limit = '{memoria_max}'")
+        if hilos:
+            self.con.execute(f"SET threads = {int(hilos)}")
+        ruta_sql = patron.replace("'", "''")
+        self.con.execute(
+            f"CREATE VIEW cartera AS SELECT * FROM read_parquet('{ruta_sql}', hive_partitioning = true, "
+            f"union_by_name = true, filename = true, file_row_number = true)"
+        )
+        self.columnas = [c for c in self._consulta("SELECT * FROM cartera LIMIT 0").columns
+                         if c not in ('filename', 'file_row_number')]
+        self.dimensiones = [d for d in DIMENSIONES_FILTRO if d in self.columnas]
+        self._opciones = {}
+
+    def _consulta(self, sql, parametros=()):
+        # Un cursor por consulta: la conexión es compartida entre sesiones (hilos)
+        return self.con.cursor().execute(sql, list(parametros)).df()
+
+    def _donde(self, selecciones, extra=()):
+        condiciones, parametros = [], []
+        for dim, seleccion in selecciones.items():
+            if dim not in self.dimensiones:
+                continue
+            valores = [str(v) for v in seleccion]
+            if not valores:
+                condiciones.append("FALSE")
+                continue
+            condiciones.append(f'"{dim}" IN ({", ".join("?" * len(valores))})')
+            parametros.extend(valores)
+        condiciones.extend(extra)
+        return ("WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def opciones(self, dim):
+        if dim not in self.columnas:
+            return []
+        if dim not in self._opciones:
+            valores = self._consulta(f'SELECT DISTINCT "{dim}" AS v FROM cartera WHERE "{dim}" IS NOT NULL')['v']
+            self._opciones[dim] = sorted(valores.tolist())
+        return self._opciones[dim]
+
+    def kpis(self, selecciones):
+        donde, parametros = self._donde(selecciones)
+        fila = self._consulta(f"""
+            SELECT count(*) AS cuentas,
+                   avg("Probabilidad_Churn"::DOUBLE) AS churn_medio,
+                   coalesce(sum("CLV_90dias"::DOUBLE), 0) AS clv_total,
+                   avg("Probabilidad_Compra_90d"::DOUBLE) AS compra_media
+            FROM cartera {donde}""", parametros).iloc[0]
+        return {
+            'cuentas': int(fila['cuentas']),
+            'churn_medio': np.nan if pd.isna(fila['churn_medio']) else float(fila['churn_medio']),
+            'clv_total': float(fila['clv_total']),
+            'compra_media': np.nan if pd.isna(fila['compra_media']) else float(fila['compra_media']),
+        }
+
+    def conteo_por(self, dim, selecciones):
+        donde, parametros = self._donde(selecciones)
+        conteo = self._consulta(f"""
+            SELECT "{dim}" AS dim, count(*) AS cuentas FROM cartera {donde}
+            GROUP BY 1 HAVING "{dim}" IS NOT NULL ORDER BY 2 DESC, 1""", parametros)
+        return pd.Series(conteo['cuentas'].to_numpy(), index=pd.Index(conteo['dim'], name=dim), name='cuentas')
+
+    def contar(self, selecciones, dim, patron):
+        donde, parametros = self._donde(selecciones, [f'regexp_matches("{dim}", ?)'])
+        return int(self._consulta(f"SELECT count(*) AS n FROM cartera {donde}", parametros + [patron])['n'].iloc[0])
+
+    def _donde_scatter(self, selecciones, extra=()):
+        return self._donde(selecciones, [f'"{COLUMNA_X}" IS NOT NULL', f'"{COLUMNA_Y}" IS NOT NULL', *extra])
+
+    def total_scatter(self, selecciones):
+        donde, parametros = self._donde_scatter(selecciones)
+        return int(self._consulta(f"SELECT count(*) AS n FROM cartera {donde}", parametros)['n'].iloc[0])
+
+    def _outliers(self, cursor, donde, parametros, n):
+        # Mismo criterio que datos_dashboard.top_k: mayor CLV, nulos al final, empate por posición
+        return cursor.execute(f"""
+            SELECT * FROM cartera {donde}
+            ORDER BY "{COLUMNA_CLV}" DESC NULLS LAST, filename, file_row_number
+            LIMIT {int(n)}""", parametros).df()
+
+    def muestra_scatter(self, selecciones, presupuesto=PUNTOS_SCATTER):
+        columnas = ", ".join(f'"{c}"' for c in COLUMNAS_SCATTER if c in self.columnas)
+        donde, parametros = self._donde_scatter(selecciones)
+        cursor = self.con.cursor()
+        total = cursor.execute(f"SELECT count(*) FROM cartera {donde}", parametros).fetchone()[0]
+        if total <= presupuesto:
+            return cursor.execute(f"SELECT {columnas} FROM cartera {donde} ORDER BY filename, file_row_number",
+                                  parametros).df()
+
+        outliers = self._outliers(cursor, donde, parametros, min(OUTLIERS_CLV, presupuesto)) \
+            if COLUMNA_CLV in self.columnas else pd.DataFrame(columns=['filename', 'file_row_number'])
+        cursor.register('outliers', outliers[['filename', 'file_row_number']])
+        resto = f"""SELECT * FROM cartera {donde} AND NOT EXISTS (
+            SELECT 1 FROM outliers o WHERE o.filename = cartera.filename AND o.file_row_number = cartera.file_row_number)"""
+
+        # Tamaño de cada estrato en orden de primera aparición (como pd.factorize), nulos primero
+        estrato = f'r."{ESTRATO_SCATTER}"' if ESTRATO_SCATTER in self.columnas else "NULL"
+        estratos = cursor.execute(f"""
+            SELECT {estrato} AS estrato, count(*) AS n FROM ({resto}) r GROUP BY 1
+            ORDER BY estrato IS NOT NULL, min(r.filename), min(r.file_row_number)""", parametros).df()
+        estratos['cupo'] = asignar_cuotas(estratos['n'].to_numpy(), presupuesto - len(outliers))
+        cursor.register('cupos', estratos[['estrato', 'cupo']])
+
+        # Dentro de cada estrato, las primeras según un hash determinista de la cuenta
+        muestra = cursor.execute(f"""
+            SELECT * FROM ({resto}) r JOIN cupos c ON {estrato} IS NOT DISTINCT FROM c.estrato
+            QUALIFY row_number() OVER (PARTITION BY {estrato} ORDER BY hash(r."CUENTA", {SEMILLA_MUESTREO}),
+                                       r.filename, r.file_row_number) <= c.cupo""", parametros).df()
+        muestra = pd.concat([outliers, muestra[outliers.columns]], ignore_index=True)
+        muestra = muestra.sort_values(['filename', 'file_row_number'], kind='stable')
+        return muestra[[c for c in COLUMNAS_SCATTER if c in muestra.columns]].reset_index(drop=True)
+
+    def densidad(self, selecciones, bins=60, percentil_y=99.5):
+        donde, parametros = self._donde_scatter(selecciones)
+        cursor = self.con.cursor()
+        n, x_min, x_max, y_min, tope = cursor.execute(f"""
+            SELECT count(*), min("{COLUMNA_X}"::DOUBLE), max("{COLUMNA_X}"::DOUBLE), min("{COLUMNA_Y}"::DOUBLE),
+                   quantile_cont("{COLUMNA_Y}"::DOUBLE, {percentil_y / 100})
+            FROM cartera {donde}""", parametros).fetchone()
+        if n == 0:
+            return np.zeros((bins, bins)), np.zeros(bins), np.zeros(bins), pd.DataFrame(columns=COLUMNAS_SCATTER)
+
+        # Misma fórmula de celdas que datos_dashboard.celdas_densidad
+        x0, x1, y0, y1 = rangos_densidad(x_min, x_max, y_min, tope)
+        celdas = cursor.execute(f"""
+            SELECT least(floor((y - ?) / (? - ?) * ?), ? - 1)::BIGINT AS cy,
+                   least(floor((x - ?) / (? - ?) * ?), ? - 1)::BIGINT AS cx,
+                   count(*) AS n
+            FROM (SELECT "{COLUMNA_X}"::DOUBLE AS x, least("{COLUMNA_Y}"::DOUBLE, ?) AS y FROM cartera {donde})
+            GROUP BY 1, 2""", [y0, y1, y0, bins, bins, x0, x1, x0, bins, bins, tope, *parametros]).df()
+        conteos = np.zeros((bins, bins), dtype=np.int64)
+        conteos[celdas['cy'].to_numpy(), celdas['cx'].to_numpy()] = celdas['n'].to_numpy()
+
+        outliers = self._outliers(cursor, donde, parametros, OUTLIERS_CLV) if COLUMNA_CLV in self.columnas \
+            else pd.DataFrame(columns=COLUMNAS_SCATTER)
+        return conteos, centros_densidad(x0, x1, bins), centros_densidad(y0, y1, bins), outliers
+
+    def pagina_tabla(self, selecciones, busqueda, modo, columna, descendente, pagina, tam_pagina, columnas):
+        extra, parametros_busqueda = [], []
+        consulta = str(busqueda).strip().lower() if busqueda else ""
+        if busqueda:
+            # Mismas reglas que IndiceCuentas.buscar: sin distinguir mayúsculas
+            if not consulta:
+                extra.append("FALSE")
+            elif modo == "Exacta":
+                extra.append('lower("CUENTA") = ?')
+            elif modo == "Empieza con":
+                extra.append('starts_with(lower("CUENTA"), ?)')
+            else:
+                extra.append('contains(lower("CUENTA"), ?)')
+            parametros_busqueda = [consulta] if consulta else []
+        donde, parametros = self._donde(selecciones, extra)
+        parametros += parametros_busqueda
+
+        cursor = self.con.cursor()
+        total = cursor.execute(f"SELECT count(*) FROM cartera {donde}", parametros).fetchone()[0]
+        orden = "filename, file_row_number"
+        if columna is not None:
+            orden = f'"{columna}" {"DESC" if descendente else "ASC"} NULLS LAST, {orden}'
+        lista = ", ".join(f'"{c}"' for c in columnas if c in self.columnas)
+        df = cursor.execute(f"""
+            SELECT {lista} FROM cartera {donde} ORDER BY {orden}
+            LIMIT {int(tam_pagina)} OFFSET {int(pagina) * int(tam_pagina)}""", parametros).df()
+        return df, int(total)
+
+
+# --- RECARGA EN CALIENTE ---
+# Versiones que se mantienen cargadas a la vez (la activa y las anteriores)
+VERSIONES_EN_MEMORIA = int(os.environ.get("DASHBOARD_VERSIONES_EN_MEMORIA", 2))
+# Tope de memoria para los datasets cargados (MB); 0 = sin tope
+MEMORIA_MAX_MB = float(os.environ.get("DASHBOARD_MEMORIA_MAX_MB", 0))
+
+
+def memoria_motor_mb(motor):
+    # El motor DuckDB no retiene el dataset: solo cuenta el de memoria
+    nbytes = getattr(motor, "nbytes", None)
+    return 0.0 if nbytes is None else nbytes() / (1024 * 1024)
+
+
+class GestorVersiones:
+    # Entrega el motor de la versión publicada. Cuando el manifiesto cambia, la
+    # nueva versión se carga en un hilo aparte y se activa al terminar; mientras
+    # tanto los reruns siguen con la anterior, sin espera. Un rerun en curso
+    # conserva su propia referencia al motor viejo hasta que termina.
+
+    def __init__(self, tipo=MOTOR, consultar_version=datos_dashboard.version_actual,
+                 versiones_en_memoria=VERSIONES_EN_MEMORIA, memoria_max_mb=MEMORIA_MAX_MB):
+        self.tipo = tipo
+        self.consultar_version = consultar_version
+        self.versiones_en_memoria = max(1, versiones_en_memoria)
+        self.memoria_max_mb = memoria_max_mb
+        self._motores = OrderedDict()  # version -> motor; el último es el activo
+        self._info = {}  # version -> datos del manifiesto (ruta, etiqueta, adjuntos)
+        self.cargando = None
+        self.error = None
+        self._fallida = None
+        self._candado = threading.Lock()
+        self._candado_carga = threading.Lock()
+
+    @property
+    def version_activa(self):
+        with self._candado:
+            return next(reversed(self._motores), None)
+
+    @property
+    def info_activa(self):
+        with self._candado:
+            return self._info.get(next(reversed(self._motores), None))
+
+    @property
+    def etiqueta_activa(self):
+        info = self.info_activa
+        return info.get("etiqueta", info["version"]) if info else None
+
+    def _crear(self, version):
+        return crear_motor(self.tipo, ruta=version["ruta"])
+
+    def _recortar(self):
+        # Con el candado tomado. Se descartan las más viejas por cantidad o por memoria; la activa nunca
+        while len(self._motores) > 1 and (
+            len(self._motores) > self.versiones_en_memoria
+            or (self.memoria_max_mb and sum(map(memoria_motor_mb, self._motores.values())) > self.memoria_max_mb)
+        ):
+            viejo, _ = self._motores.popitem(last=False)
+            self._info.pop(viejo, None)
+
+    def _motor_crecio(self):
+        # Un motor cargado construyó un índice o un rango de orden: se revisa el tope otra vez
+        with self._candado:
+            self._recortar()
+
+    def _activar(self, version, motor):
+        if hasattr(motor, "al_crecer"):
+            motor.al_crecer = self._motor_crecio
+        with self._candado:
+            self._motores[version["version"]] = motor
+            self._info[version["version"]] = version
+            self._motores.move_to_end(version["version"])
+            self._recortar()
+
+    def _cargar_en_segundo_plano(self, version):
+        try:
+            motor = self._crear(version)
+        except Exception as e:
+            with self._candado:
+                self.error = f"{version['version']}: {e}"
+                self._fallida = version["version"]
+                self.cargando = None
+            return
+        self._activar(version, motor)
+        with self._candado:
+            self.cargando = None
+            self.error = None
+
+    def motor(self):
+        version = self.consultar_version()
+        with self._candado:
+            activo = self._motores[next(reversed(self._motores))] if self._motores else None
+            if version is None:
+                return activo
+            clave = version["version"]
+            if clave in self._motores:
+                # El puntero volvió a una versión que sigue cargada: se activa al instante
+                self._motores.move_to_end(clave)
+                return self._motores[clave]
+            if activo is not None:
+                if self.cargando != clave and self._fallida != clave:
+                    self.cargando = clave
+                    threading.Thread(target=self._cargar_en_segundo_plano, args=(version,), daemon=True).start()
+                return activo
+
+        # Primer arranque: no hay nada que servir, se carga en línea (una sola vez)
+        with self._candado_carga:
+            with self._candado:
+                if clave in self._motores:
+                    return self._motores[clave]
+            motor = self._crear(version)
+            self._activar(version, motor)
+            return motor
+
+
+def crear_motor(tipo=MOTOR, df=None, ruta=datos_dashboard.RUTA_DATASET):
+    if tipo == "duckdb":
+        return MotorDuckDB(ruta)
+    if tipo == "memoria":
+        return MotorMemoria(df if df is not None else datos_dashboard.cargar_dataset(ruta))
+    raise ValueError(f"Motor desconocido '{tipo}'. Opciones: {', '.join(MOTORES)}")
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+
+import telemetria
+
+# Perfil de render del dashboard, opcional: ?perfil=1 en la URL o
+# DASHBOARD_PERFIL=1 en el entorno (?perfil=0 lo apaga para una sesión).
+# dashboard.py marca dónde empieza cada sección (consulta, construcción de la
+# figura, envío al navegador) y aquí se mide el tiempo de cada una, el tamaño
+# de lo que se envía y la variación de RSS del proceso. Cada rerun agrega una
+# línea a logs/perfil_dashboard.jsonl.
+#
+# El RSS es del proceso completo: con varias sesiones a la vez, el delta de una
+# sección incluye lo que hicieron las demás en ese intervalo.
+
+RUTA_PERFIL = os.environ.get("DASHBOARD_PERFIL_RUTA", os.path.join("./logs", "perfil_dashboard.jsonl"))
+VALORES_ACTIVO = ("1", "true", "si", "sí")
+PERFIL_POR_DEFECTO = os.environ.get("DASHBOARD_PERFIL", "").strip().lower() in VALORES_ACTIVO
+
+
+def activado(query_params):
+    valor = query_params.get("perfil")
+    if valor is None:
+        return PERFIL_POR_DEFECTO
+    return str(valor).strip().lower() in VALORES_ACTIVO
+
+
+def tamano_envio(objeto):
+    # Bytes que viajan al navegador: JSON de la figura de plotly o Arrow IPC del
+    # DataFrame (los formatos que usan st.plotly_chart y st.dataframe)
+    if hasattr(objeto, "to_plotly_json"):
+        return len(objeto.to_json().encode("utf-8"))
+    if isinstance(objeto, pd.DataFrame):
+        tabla = pa.Table.from_pandas(objeto, preserve_index=False)
+        destino = pa.BufferOutputStream()
+        with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return destino.getvalue().size
+    return len(json.dumps(objeto, default=str).encode("utf-8"))
+
+
+class PerfilRender:
+    # Inactivo, cada método retorna de inmediato: el dashboard puede dejar las
+    # marcas siempre puestas
+
+    def __init__(self, activo=True, sesion=None):
+        self.activo = activo
+        self.sesion = sesion
+        self.secciones = []
+        self.datos = {}
+        self._actual = None
+        self._inicio = time.perf_counter()
+        self._rss_inicial = telemetria.rss_mb() if activo else None
+
+    def seccion(self, nombre):
+        # Cierra la sección en curso y abre `nombre`
+        if not self.activo:
+            return
+        self._cerrar()
+        self._actual = {"seccion": nombre, "bytes": None, "pausa": 0.0, "rss": telemetria.rss_mb(),
+                        "inicio": time.perf_counter()}
+
+    def envio(self, objeto):
+        # Suma al tamaño enviado por la sección en curso; medirlo no cuenta en su tiempo
+        if not self.activo or self._actual is None:
+            return
+        inicio = time.perf_counter()
+        self._actual["bytes"] = (self._actual["bytes"] or 0) + tamano_envio(objeto)
+        self._actual["pausa"] += time.perf_counter() - inicio
+
+    def contexto(self, **datos):
+        if self.activo:
+            self.datos.update(datos)
+
+    def _cerrar(self):
+        if self._actual is None:
+            return
+        actual, self._actual = self._actual, None
+        fin = time.perf_counter()
+        rss = telemetria.rss_mb()
+        self.secciones.append({
+            "seccion": actual["seccion"],
+            "ms": (fin - actual["inicio"] - actual["pausa"]) * 1000,
+            "bytes": actual["bytes"],
+            "rss_delta_mb": None if rss is None or actual["rss"] is None else rss - actual["rss"],
+        })
+
+    def terminar(self):
+        if not self.activo:
+            return None
+        self._cerrar()
+        rss = telemetria.rss_mb()
+        return {
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "sesion": self.sesion,
+            "total_ms": (time.perf_counter() - self._inicio) * 1000,
+            "bytes_total": sum(s["bytes"] or 0 for s in self.secciones),
+            "rss_mb": rss,
+            "rss_delta_mb": None if rss is None or self._rss_inicial is None else rss - self._rss_inicial,
+            **self.datos,
+            "secciones": self.secciones,
+        }
+
+
+def registrar(registro, ruta=RUTA_PERFIL):
+    telemetria.registrar([registro], ruta)
+
+
+def resumen(ruta=RUTA_PERFIL):
+    # Por sección: reruns, mediana y p95 de ms, y mediana de bytes
+    filas = [dict(s, sesion=r.get("sesion")) for r in telemetria.leer_registros(ruta) for s in r.get("secciones", [])]
+    if not filas:
+        return pd.DataFrame()
+    df = pd.DataFrame(filas)
+    return df.groupby("seccion", sort=False).agg(
+        reruns=("ms", "size"),
+        ms_mediana=("ms", "median"),
+        ms_p95=("ms", lambda s: s.quantile(0.95)),
+        bytes_mediana=("bytes", "median"),
+    ).sort_values("ms_p95", ascending=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secciones del dashboard ordenadas por p95 de tiempo de render")
+    parser.add_argument("--ruta", default=RUTA_PERFIL, help="Archivo JSONL del perfil")
+    args = parser.parse_args(argv)
+
+    tabla = resumen(args.ruta)
+    if tabla.empty:
+        print(f"Sin registros en {args.ruta}. Abre el dashboard con ?perfil=1 o DASHBOARD_PERFIL=1.")
+        return 0
+    print(tabla.to_string(float_format="{:,.1f}".format))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,577 @@
+import os
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# Valores que los notebooks escriben como "sin dato"
+VALORES_NULOS = ["", "NA", "NaN", "nan", "null", "Dato no disponible"]
+
+# Columnas cuyo tipo no se deja a la inferencia (la inferencia por bloques
+# puede decidir int en el primero y fallar en uno posterior)
+COLUMNAS_NUMERICAS = ['Probabilidad_Churn', 'Probabilidad_Compra_90d', 'Monto_Esperado_90d', 'CLV_90dias']
+COLUMNAS_TEXTO = ['CUENTA']
+
+TAM_BLOQUE_CSV = 64 * 1024 * 1024
+
+# Columnas de texto con pocos valores distintos se guardan como categoría
+UMBRAL_CATEGORIA = 0.5
+
+# Tipo de todas las columnas flotantes del dataset del dashboard. Las sumas de
+# los KPIs se hacen en float64, así que la precisión de float32 alcanza.
+TIPO_FLOTANTE = "float32"
+
+# Versiones publicadas que se conservan en disco (además de la actual)
+VERSIONES_RETENIDAS = 3
+
+# Finalización particionada: carpeta particion=<clave>/ por partición
+COLUMNA_PARTICION = "particion"
+PARTICIONAR_POR = ["hash", "NEGOCIO"]
+PARTICIONES_HASH = 16
+TAM_LOTE_REPARTO = 256_000
+
+
+# --- CONVERSIÓN CSV -> PARQUET ---
+def convertir_csv_a_parquet(ruta_csv, ruta_parquet, tam_bloque=TAM_BLOQUE_CSV, memoria=None):
+    # Lectura en streaming: nunca se tiene el CSV completo en memoria.
+    # Cada bloque se escribe como row group con sus estadísticas en el footer.
+    # Con `memoria` (runner "proceso") los bloques también se conservan y la
+    # tabla de Arrow queda por ruta para la finalización, que no relee el archivo.
+    _convertir([ruta_csv], ruta_parquet, tam_bloque, memoria)
+
+
+def convertir_particiones_a_parquet(*rutas, tam_bloque=TAM_BLOQUE_CSV, memoria=None):
+    # Salidas por partición de los notebooks (rutas CSV, en orden) -> un solo
+    # Parquet, la última ruta. Misma conversión que convertir_csv_a_parquet.
+    *rutas_csv, ruta_parquet = rutas
+    _convertir(rutas_csv, ruta_parquet, tam_bloque, memoria)
+
+
+def _convertir(rutas_csv, ruta_parquet, tam_bloque, memoria):
+    temporal = f"{ruta_parquet}.tmp"
+    try:
+        try:
+            tabla = _escribir_parquet(rutas_csv, temporal, tam_bloque, texto_resto=False, conservar=memoria is not None)
+        except pa.ArrowInvalid as e:
+            # Un bloque posterior no encajó con el tipo inferido al inicio:
+            # se repite dejando como texto todo lo que no es numérico conocido
+            print(f"Inferencia de tipos inconsistente ({e}); se reintenta con columnas de texto.")
+            tabla = _escribir_parquet(rutas_csv, temporal, tam_bloque, texto_resto=True, conservar=memoria is not None)
+        os.replace(temporal, ruta_parquet)
+        if memoria is not None:
+            memoria[ruta_parquet] = tabla
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _lector_csv(ruta_csv, tam_bloque, texto_resto, esquema=None):
+    encabezado = pd.read_csv(ruta_csv, nrows=0, encoding="utf-8-sig").columns
+    tipos = {}
+    for col in encabezado:
+        if esquema is not None and col in esquema.names:
+            # Varios archivos: los mismos tipos en todos, para que encajen
+            tipos[col] = esquema.field(col).type
+        elif col.strip() in COLUMNAS_NUMERICAS:
+            tipos[col] = pa.float64()
+        elif col.strip() in COLUMNAS_TEXTO or texto_resto:
+            tipos[col] = pa.string()
+
+    return pv.open_csv(
+        ruta_csv,
+        read_options=pv.ReadOptions(block_size=tam_bloque, encoding="utf-8-sig"),
+        convert_options=pv.ConvertOptions(
+            column_types=tipos,
+            null_values=VALORES_NULOS,
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def _escribir_parquet(rutas_csv, ruta_parquet, tam_bloque, texto_resto, conservar=False):
+    esquema = None
+    if len(rutas_csv) > 1:
+        # Varias particiones: los tipos se infieren en la más grande (una
+        # partición vacía no tiene de dónde inferirlos) y se imponen a todas
+        esquema = _lector_csv(max(rutas_csv, key=os.path.getsize), tam_bloque, texto_resto).schema
+    escritor = None
+    lotes = []
+    try:
+        for ruta_csv in rutas_csv:
+            lector = _lector_csv(ruta_csv, tam_bloque, texto_resto, esquema)
+            if esquema is None:
+                esquema = lector.schema
+            elif not lector.schema.equals(esquema):
+                raise ValueError(f"{ruta_csv} no tiene las mismas columnas que {rutas_csv[0]}")
+            if escritor is None:
+                # Un CSV sin filas deja igual el archivo con su esquema
+                escritor = pq.ParquetWriter(ruta_parquet, esquema, compression="zstd", write_statistics=True)
+            for lote in lector:
+                escritor.write_batch(lote)
+                if conservar:
+                    lotes.append(lote)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return pa.Table.from_batches(lotes, schema=esquema) if conservar else None
+
+
+# --- PUNTUACIÓN POR PARTICIONES ---
+# Con --particiones N los notebooks de churn, LTV y recomendación corren una
+# vez por partición de cuentas (parámetros `particion` y `particiones`), como
+# etapas independientes del pool. Cada uno puntúa solo sus cuentas y escribe
+# sus salidas con ruta_particion(); las etapas siguientes leen las mismas rutas.
+# Los notebooks usan estas funciones para que todos repartan igual.
+
+def cubetas_hash(cuentas, particiones):
+    # hash_pandas_object es estable entre procesos y corridas (hash() no)
+    cuentas = pd.Series(cuentas).astype("string")
+    return pd.util.hash_pandas_object(cuentas, index=False).to_numpy() % particiones
+
+
+def en_particion(cuentas, particion, particiones):
+    # Máscara de las cuentas que le tocan a la partición `particion` (0 .. particiones - 1)
+    return cubetas_hash(cuentas, particiones) == int(particion)
+
+
+def ruta_particion(ruta, particion):
+    # data/scores_churn.csv -> data/scores_churn.p003.csv
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.p{int(particion):03d}{extension}"
+
+
+# --- ESTADÍSTICAS DEL DATASET ---
+# Misma estructura en ambas rutas:
+# {"filas", "columnas", "esquema": {col: tipo}, "por_columna": {col: {"nulos", "min", "max"}}}
+
+def estadisticas_parquet(ruta):
+    # Solo se lee el footer: filas, esquema y estadísticas de cada row group
+    meta = pq.ParquetFile(ruta).metadata
+    esquema = meta.schema.to_arrow_schema()
+    por_columna = {nombre: {"nulos": 0, "min": None, "max": None} for nombre in esquema.names}
+
+    for i_rg in range(meta.num_row_groups):
+        rg = meta.row_group(i_rg)
+        for i_col in range(rg.num_columns):
+            columna = rg.column(i_col)
+            nombre = columna.path_in_schema
+            stats = columna.statistics
+            if nombre not in por_columna or stats is None:
+                continue
+            acumulado = por_columna[nombre]
+            if stats.has_null_count:
+                acumulado["nulos"] += stats.null_count
+            if stats.has_min_max:
+                acumulado["min"] = stats.min if acumulado["min"] is None else min(acumulado["min"], stats.min)
+                acumulado["max"] = stats.max if acumulado["max"] is None else max(acumulado["max"], stats.max)
+
+    return {
+        "filas": meta.num_rows,
+        "columnas": len(esquema.names),
+        "esquema": {campo.name: str(campo.type) for campo in esquema},
+        "por_columna": por_columna,
+    }
+
+
+def estadisticas_csv(ruta, tam_chunk=250_000):
+    # Respaldo para salidas CSV heredadas: una pasada por trozos, memoria acotada
+    filas = 0
+    por_columna = {}
+    esquema = {}
+
+    for chunk in pd.read_csv(ruta, chunksize=tam_chunk, low_memory=False,
+                             na_values=VALORES_NULOS, encoding="utf-8-sig"):
+        chunk.columns = chunk.columns.str.strip()
+        filas += len(chunk)
+        nulos = chunk.isna().sum()
+        for col in chunk.columns:
+            acumulado = por_columna.setdefault(col, {"nulos": 0, "min": None, "max": None})
+            acumulado["nulos"] += int(nulos[col])
+            if esquema.get(col) == "object":
+                continue
+            # Una columna numérica que en algún trozo trae texto pasa a "object" y pierde min/max
+            if not pd.api.types.is_numeric_dtype(chunk[col]):
+                esquema[col] = "object"
+                acumulado["min"] = acumulado["max"] = None
+                continue
+            esquema[col] = str(chunk[col].dtype)
+            if chunk[col].notna().any():
+                mn, mx = chunk[col].min(), chunk[col].max()
+                acumulado["min"] = mn if acumulado["min"] is None else min(acumulado["min"], mn)
+                acumulado["max"] = mx if acumulado["max"] is None else max(acumulado["max"], mx)
+
+    return {
+        "filas": filas,
+        "columnas": len(por_columna),
+        "esquema": esquema,
+        "por_columna": por_columna,
+    }
+
+
+# --- FINALIZACIÓN PARA EL DASHBOARD ---
+# Columnas derivadas que antes calculaba dashboard.load_data en cada arranque.
+# Son deterministas dada la salida del pipeline, así que se calculan una vez aquí.
+
+def _normalizar(df):
+    df.columns = df.columns.str.strip()
+    df = df.replace('Dato no disponible', pd.NA)
+
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def entrenar_derivaciones(df):
+    # Lo que depende de toda la cartera y no de cada cuenta (los cuartiles de
+    # CLV). Con la cartera repartida se calcula una vez y se aplica igual a
+    # cada partición, así el resultado no depende de cómo se reparta.
+    modelo = {"recompra": False, "bordes_valor": None}
+    p_col, v_col = 'Probabilidad_Compra_90d', 'CLV_90dias'
+    if p_col in df.columns:
+        modelo["recompra"] = bool(df[p_col].notnull().any())
+    if v_col in df.columns and df[v_col].notnull().any():
+        modelo["bordes_valor"] = df[v_col].quantile([0, 0.25, 0.5, 0.75, 1.0]).unique().tolist()
+    return modelo
+
+
+def aplicar_derivaciones(df, modelo):
+    # 1. Propensión de Recompra
+    p_col = 'Probabilidad_Compra_90d'
+    if p_col in df.columns and modelo["recompra"]:
+        bins_p = [-0.001, 0.25, 0.50, 0.75, 1.001]
+        labels_p = ['Baja Propensión', 'Propensión Media', 'Alta Propensión', 'Muy Alta Propensión']
+        df['Segmento_Recompra'] = pd.cut(df[p_col], bins=bins_p, labels=labels_p)
+    else:
+        df['Segmento_Recompra'] = 'Sin datos'
+
+    # 2. Valor Futuro (Cuartiles)
+    v_col = 'CLV_90dias'
+    if v_col in df.columns and modelo["bordes_valor"] is not None:
+        try:
+            quantile_labels = ['Valor Bronce', 'Valor Plata', 'Valor Oro', 'Valor Diamante']
+            edges = modelo["bordes_valor"]
+            if len(edges) > 1:
+                actual_labels = quantile_labels[:len(edges)-1]
+                df['Potencial_Valor'] = pd.cut(df[v_col], bins=edges, labels=actual_labels, include_lowest=True)
+            else:
+                df['Potencial_Valor'] = 'Valor Único'
+        except Exception:
+            df['Potencial_Valor'] = 'Indeterminado'
+    else:
+        df['Potencial_Valor'] = 'Sin datos'
+
+    return df
+
+
+def derivar_columnas_dashboard(df, modelo=None):
+    df = _normalizar(df)
+    return aplicar_derivaciones(df, entrenar_derivaciones(df) if modelo is None else modelo)
+
+
+def compactar_tipos(df, tipos=None):
+    # Texto repetido -> categoría, flotantes -> float32, enteros al tipo más chico.
+    # `tipos` (finalización particionada): tipo ya decidido sobre toda la
+    # cartera por columna (None = se deja como está), así todas las particiones
+    # quedan con el tipo que tendría la columna completa.
+    for col in df.columns:
+        serie = df[col]
+        if tipos is not None and col in tipos:
+            if tipos[col] is not None:
+                df[col] = serie.astype(tipos[col])
+            continue
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_float_dtype(serie):
+            # Siempre: downcast='float' solo reduce si float32 no pierde nada,
+            # y con montos reales CLV y Monto_Esperado quedaban en float64
+            df[col] = serie.astype(TIPO_FLOTANTE)
+        elif pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif col not in COLUMNAS_TEXTO and (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+            if len(serie) and serie.nunique(dropna=True) < UMBRAL_CATEGORIA * len(serie):
+                df[col] = serie.astype('category')
+    return df
+
+
+def tabla_en_memoria(memoria, ruta):
+    # Tabla de Arrow que dejó la etapa anterior en el mismo proceso; se retira
+    # del diccionario para no retenerla el resto de la corrida. None si esa
+    # etapa no corrió aquí (vigente, u otro proceso): entonces se lee el archivo.
+    if memoria is None:
+        return None
+    return memoria.pop(ruta, None)
+
+
+def finalizar_dataset(ruta_parquet, ruta_salida, memoria=None):
+    # `memoria` (runner "proceso" del pipeline): la entrada llega como tabla de
+    # Arrow desde la conversión o la fusión, y el resultado queda cargado por
+    # ruta para la etapa de audiencias.
+    tabla = tabla_en_memoria(memoria, ruta_parquet)
+    df = tabla.to_pandas() if tabla is not None else pd.read_parquet(ruta_parquet)
+    del tabla
+    df = compactar_tipos(derivar_columnas_dashboard(df))
+
+    # Los metadatos de pandas en el Parquet conservan categorías y su orden
+    temporal = f"{ruta_salida}.tmp"
+    df.to_parquet(temporal, index=False, compression="zstd")
+    os.replace(temporal, ruta_salida)
+    if memoria is not None:
+        memoria[ruta_salida] = df
+
+
+# --- FINALIZACIÓN PARTICIONADA ---
+# Lo que depende de toda la cartera se decide una vez y se aplica igual a cada partición:
+#   1. el modelo de derivaciones (cuartiles de CLV), leyendo solo dos columnas,
+#   2. en la pasada que reparte la cartera (por NEGOCIO o por hash de CUENTA),
+#      los tipos compactos de cada columna (qué texto va como categoría y con
+#      qué categorías, a qué entero se reduce cada columna entera),
+#   3. cada partición se finaliza en su propio proceso con el mismo modelo y
+#      los mismos tipos: el resultado es el de finalizar_dataset, repartido.
+# La salida es un directorio <ruta_salida>/particion=<clave>/parte-0.parquet que
+# pyarrow, pandas y DuckDB leen como un único dataset.
+
+def _claves_particion(lote, por, particiones):
+    columnas = {nombre.strip(): nombre for nombre in lote.schema.names}
+    if por == "NEGOCIO":
+        codigos, valores = pd.factorize(lote.column(columnas['NEGOCIO']).to_pandas().astype("string"))
+        # El código -1 (nulo) toma la última etiqueta
+        etiquetas = np.array([quote(v, safe="") for v in valores] + ["sin_dato"], dtype=object)
+        return etiquetas[codigos]
+    cubetas = cubetas_hash(lote.column(columnas['CUENTA']).to_pandas(), particiones)
+    return np.array([f"{i:03d}" for i in range(particiones)], dtype=object)[cubetas]
+
+
+def _lotes(ruta_parquet, tabla=None, tam_lote=TAM_LOTE_REPARTO):
+    # Lotes de la tabla en memoria si la hay; si no, lectura del Parquet por lotes
+    if tabla is not None:
+        return tabla.to_batches(max_chunksize=tam_lote)
+    return pq.ParquetFile(ruta_parquet).iter_batches(batch_size=tam_lote)
+
+
+def _acumular_tipos(acumulado, lote, filas):
+    # Lo que necesita compactar_tipos de cada columna de texto o entera, sumado lote a lote
+    for campo in lote.schema:
+        col = campo.name.strip()
+        if col in COLUMNAS_TEXTO or col in COLUMNAS_NUMERICAS:
+            continue
+        columna = lote.column(campo.name)
+        if pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type):
+            valores = acumulado.setdefault(col, {"texto": set()})["texto"]
+            if valores is None:
+                continue
+            # 'Dato no disponible' se vuelve nulo al normalizar
+            valores.update(v for v in pc.unique(columna).to_pylist() if v is not None and v != 'Dato no disponible')
+            if len(valores) >= UMBRAL_CATEGORIA * filas:
+                acumulado[col]["texto"] = None  # demasiados valores: no será categoría
+        elif pa.types.is_integer(campo.type):
+            rango = acumulado.setdefault(col, {"min": None, "max": None, "nulos": 0})
+            extremos = pc.min_max(columna).as_py()
+            rango["nulos"] += columna.null_count
+            for clave, elegir in (("min", min), ("max", max)):
+                if extremos[clave] is not None:
+                    rango[clave] = extremos[clave] if rango[clave] is None else elegir(rango[clave], extremos[clave])
+
+
+def _tipo_compacto(serie):
+    # compactar_tipos sobre una columna completa
+    return compactar_tipos(serie.to_frame())[serie.name].dtype
+
+
+def _tipos_globales(acumulado, derivadas):
+    tipos = {}
+    for col, datos in acumulado.items():
+        if "texto" in datos:
+            valores = datos["texto"]
+            tipos[col] = None if valores is None else pd.CategoricalDtype(sorted(valores))
+        elif datos["nulos"] or datos["min"] is None:
+            # Con nulos pandas la lee como flotante
+            tipos[col] = TIPO_FLOTANTE
+        else:
+            tipos[col] = pd.to_numeric(pd.Series([datos["min"], datos["max"]]), downcast='integer').dtype
+    # Columnas derivadas: calculadas sobre toda la cartera al entrenar
+    for col in ['Segmento_Recompra', 'Potencial_Valor']:
+        tipos[col] = _tipo_compacto(derivadas[col])
+    return tipos
+
+
+def _repartir(lotes, carpeta, por, particiones, filas):
+    # Una sola pasada sobre la entrada; cada lote se reparte entre los
+    # escritores de sus particiones. Memoria acotada al tamaño del lote.
+    os.makedirs(carpeta, exist_ok=True)
+    escritores = {}
+    acumulado = {}
+    try:
+        for lote in lotes:
+            _acumular_tipos(acumulado, lote, filas)
+            codigos, claves = pd.factorize(_claves_particion(lote, por, particiones))
+            for i, clave in enumerate(claves):
+                if clave not in escritores:
+                    escritores[clave] = pq.ParquetWriter(os.path.join(carpeta, f"{clave}.parquet"),
+                                                         lote.schema, compression="zstd")
+                escritores[clave].write_batch(lote.filter(pa.array(codigos == i)))
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+    return {clave: os.path.join(carpeta, f"{clave}.parquet") for clave in sorted(escritores)}, acumulado
+
+
+def _finalizar_particion(ruta_particion, ruta_salida, modelo, tipos):
+    # Corre en un proceso del pool. Mismo código que finalizar_dataset, con el
+    # modelo y los tipos de toda la cartera: las derivaciones van sobre los
+    # valores originales (los bordes de los cuartiles se calcularon con ellos)
+    # y las categorías quedan escritas, como en el archivo único.
+    df = pd.read_parquet(ruta_particion)
+    df = compactar_tipos(derivar_columnas_dashboard(df, modelo), tipos)
+    os.makedirs(os.path.dirname(ruta_salida), exist_ok=True)
+    df.to_parquet(ruta_salida, index=False, compression="zstd")
+    return len(df)
+
+
+def finalizar_dataset_particionado(ruta_parquet, ruta_salida, por="hash", particiones=PARTICIONES_HASH, workers=None,
+                                   memoria=None):
+    if por not in PARTICIONAR_POR:
+        raise ValueError(f"Partición desconocida: {por}. Opciones: {', '.join(PARTICIONAR_POR)}")
+    # Con el runner "proceso" la entrada puede llegar en memoria (ver finalizar_dataset)
+    tabla = tabla_en_memoria(memoria, ruta_parquet)
+
+    # 1. Entrenamiento sobre toda la cartera, leyendo solo dos columnas
+    necesarias = [n for n in (tabla.schema if tabla is not None else pq.read_schema(ruta_parquet)).names
+                  if n.strip() in ('Probabilidad_Compra_90d', 'CLV_90dias')]
+    datos = tabla.select(necesarias).to_pandas() if tabla is not None \
+        else pd.read_parquet(ruta_parquet, columns=necesarias)
+    datos = _normalizar(datos)
+    modelo = entrenar_derivaciones(datos)
+    derivadas = aplicar_derivaciones(datos, modelo)
+    filas = tabla.num_rows if tabla is not None else pq.ParquetFile(ruta_parquet).metadata.num_rows
+
+    temporal = f"{ruta_salida}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    try:
+        # 2. Reparto y tipos de toda la cartera
+        piezas, acumulado = _repartir(_lotes(ruta_parquet, tabla), os.path.join(temporal, "_reparto"),
+                                      por, particiones, filas)
+        del tabla
+        tipos = _tipos_globales(acumulado, derivadas)
+        del datos, derivadas
+
+        # 3. Finalización en paralelo, un proceso por núcleo
+        workers = max(1, min(workers or os.cpu_count() or 1, len(piezas) or 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [
+                pool.submit(_finalizar_particion, origen,
+                            os.path.join(temporal, f"{COLUMNA_PARTICION}={clave}", "parte-0.parquet"), modelo, tipos)
+                for clave, origen in piezas.items()
+            ]
+            filas = sum(f.result() for f in futuros)
+        shutil.rmtree(os.path.join(temporal, "_reparto"))
+
+        # Los directorios no se reemplazan con un solo rename: se aparta el
+        # anterior y se renombra el nuevo. El dashboard no lee esta carpeta
+        # sino la copia publicada en versiones/, así que no ve el hueco.
+        anterior = f"{ruta_salida}.anterior"
+        shutil.rmtree(anterior, ignore_errors=True)
+        if os.path.exists(ruta_salida):
+            os.replace(ruta_salida, anterior)
+        os.replace(temporal, ruta_salida)
+        shutil.rmtree(anterior, ignore_errors=True)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    print(f"{filas:,} cuentas en {len(piezas)} particiones ({por}), {workers} procesos")
+
+
+# --- PUBLICACIÓN VERSIONADA ---
+# Cada corrida deja una copia inmutable del dataset en <datos>/versiones/<id>/ y
+# luego reemplaza de forma atómica el manifiesto que apunta a ella. El
+# dashboard solo mira el manifiesto: nunca ve un archivo a medio escribir.
+
+def _enlazar_o_copiar(origen, destino):
+    # Enlace duro si el sistema de archivos lo permite (sin copiar bytes). Es
+    # seguro porque las etapas publican con os.replace: el archivo enlazado no
+    # se vuelve a escribir, la siguiente corrida crea uno nuevo.
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copy2(origen, destino)
+
+
+def _filas_parquet(ruta):
+    if os.path.isfile(ruta):
+        return pq.ParquetFile(ruta).metadata.num_rows
+    return sum(pq.ParquetFile(os.path.join(raiz, nombre)).metadata.num_rows
+               for raiz, _, nombres in os.walk(ruta) for nombre in nombres if nombre.endswith(".parquet"))
+
+
+def _tamano(ruta):
+    if os.path.isfile(ruta):
+        return os.path.getsize(ruta)
+    return sum(os.path.getsize(os.path.join(raiz, nombre)) for raiz, _, nombres in os.walk(ruta) for nombre in nombres)
+
+
+def leer_manifiesto(ruta_manifiesto):
+    try:
+        with open(ruta_manifiesto, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publicar_version(ruta_dataset, *rutas, retener=VERSIONES_RETENIDAS):
+    # rutas = adjuntos que viajan con la versión (p. ej. audiencias) + manifiesto al final
+    *adjuntos, ruta_manifiesto = rutas
+    carpeta_versiones = os.path.join(os.path.dirname(ruta_manifiesto) or ".", "versiones")
+    version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    destino = os.path.join(carpeta_versiones, version)
+    temporal = f"{destino}.tmp"
+
+    # La carpeta de la versión se arma aparte y se renombra completa
+    os.makedirs(temporal)
+    try:
+        nombre = os.path.basename(os.path.normpath(ruta_dataset))
+        if os.path.isdir(ruta_dataset):
+            shutil.copytree(ruta_dataset, os.path.join(temporal, nombre), copy_function=_enlazar_o_copiar)
+        else:
+            _enlazar_o_copiar(ruta_dataset, os.path.join(temporal, nombre))
+        for adjunto in adjuntos:
+            _enlazar_o_copiar(adjunto, os.path.join(temporal, os.path.basename(adjunto)))
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            shutil.rmtree(temporal)
+
+    publicado = os.path.join(destino, nombre)
+    # Rutas relativas al manifiesto, para que la carpeta de datos se pueda mover
+    base = os.path.dirname(os.path.abspath(ruta_manifiesto))
+    manifiesto = {
+        "version": version,
+        "ruta": os.path.relpath(publicado, base),
+        "adjuntos": {os.path.basename(a): os.path.relpath(os.path.join(destino, os.path.basename(a)), base)
+                     for a in adjuntos},
+        "filas": _filas_parquet(publicado),
+        "bytes": _tamano(publicado),
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    temporal_manifiesto = f"{ruta_manifiesto}.tmp"
+    with open(temporal_manifiesto, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(temporal_manifiesto, ruta_manifiesto)
+
+    podar_versiones(carpeta_versiones, retener, actual=version)
+    return manifiesto
+
+
+def podar_versiones(carpeta_versiones, retener=VERSIONES_RETENIDAS, actual=None):
+    # Conserva las `retener` más recientes: un dashboard que todavía sirve una
+    # versión anterior (el motor DuckDB lee del disco) no se queda sin archivo
+    versiones = sorted(v for v in os.listdir(carpeta_versiones)
+                       if os.path.isdir(os.path.join(carpeta_versiones, v)) and not v.endswith(".tmp"))
+    for version in versiones[:-retener] if retener > 0 else versiones:
+        if version != actual:
+            shutil.rmtree(os.path.join(carpeta_versiones, version), ignore_errors=True)
@@ -0,0 +1,99 @@
+import os
+import sys
+import gc
+import json
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+import telemetria
+
+# Prueba de carga del dashboard sin navegador: abre N sesiones simultáneas
+# (AppTest, mismo proceso y mismos cachés que un servidor Streamlit) y mide
+# la memoria del proceso a medida que crece N. Con el dataset compartido la
+# memoria debe crecer muy poco por sesión; con una copia por sesión, en línea recta.
+
+RUTA_SALIDA = os.path.join("./logs", "prueba_carga.json")
+PRESETS = ["Escudo de Oro (Retención VIP)", "Caja Rápida (Conversión)",
+           "Diamantes en Bruto (Upselling)", "Operación Lázaro (Reactivación)"]
+
+
+def sesion(script, i, timeout):
+    # Un usuario: carga inicial y un cambio de preset (rerun con otra selección)
+    at = AppTest.from_file(script, default_timeout=timeout).run()
+    at.selectbox(key="selector_estrategia").set_value(PRESETS[i % len(PRESETS)]).run()
+    errores = [e.value for e in at.exception]
+    if errores:
+        raise RuntimeError(f"Sesión {i}: {errores[0]}")
+    return at
+
+
+def medir(script, sesiones, timeout):
+    filas = []
+    base = telemetria.rss_mb()
+    abiertas = []
+    for n in sesiones:
+        # Se suman sesiones hasta llegar a n, todas ejecutándose a la vez
+        nuevas = range(len(abiertas), n)
+        with telemetria.MedidorEtapa(intervalo=0.05) as medidor:
+            with ThreadPoolExecutor(max_workers=max(len(nuevas), 1)) as pool:
+                abiertas.extend(pool.map(lambda i: sesion(script, i, timeout), nuevas))
+        gc.collect()
+        retenida = telemetria.rss_mb()
+        # Costo de cada sesión adicional respecto a la primera medición (que incluye la carga del dataset)
+        primera = filas[0] if filas else None
+        extra = None
+        if primera and n > primera["sesiones"]:
+            extra = (retenida - primera["rss_retenida_mb"]) / (n - primera["sesiones"])
+        filas.append({
+            "sesiones": n,
+            "wall_s": medidor.wall_s,
+            "rss_pico_mb": medidor.rss_pico_mb,
+            "rss_retenida_mb": retenida,
+            "mb_por_sesion_extra": extra,
+        })
+    return base, filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memoria del dashboard según el número de sesiones simultáneas")
+    # Junto a este archivo, no en el directorio actual: funciona desde cualquier carpeta
+    parser.add_argument("--script", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py"),
+                        help="App de Streamlit a probar")
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Cantidades de sesiones a medir (acumulativas)")
+    parser.add_argument("--timeout", type=float, default=300, help="Segundos máximos por rerun")
+    parser.add_argument("--salida", default=RUTA_SALIDA, help="JSON con los resultados")
+    args = parser.parse_args(argv)
+
+    if telemetria.psutil is None:
+        print("Se necesita psutil para medir la memoria (pip install psutil).")
+        return 1
+
+    script = os.path.abspath(args.script)
+    base, filas = medir(script, sorted(set(args.sesiones)), args.timeout)
+
+    print(f"RSS inicial: {base:,.0f} MB\n")
+    print(f"{'Sesiones':>8} {'Tiempo (s)':>11} {'RSS pico (MB)':>14} {'RSS (MB)':>10} {'MB/sesión extra':>16}")
+    for f in filas:
+        extra = "-" if f['mb_por_sesion_extra'] is None else f"{f['mb_por_sesion_extra']:,.1f}"
+        print(f"{f['sesiones']:>8} {f['wall_s']:>11.2f} {f['rss_pico_mb']:>14,.0f} "
+              f"{f['rss_retenida_mb']:>10,.0f} {extra:>16}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "script": script,
+            "motor": os.environ.get("DASHBOARD_MOTOR", "memoria"),
+            "rss_inicial_mb": base,
+            "mediciones": filas,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,23 @@ os.environ['PYTHONWARNINGS'] = 'ignore'
 
 import papermill as pm
 import sys
-import pandas as pd
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
 import warnings
 import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+import telemetria
+import preparacion_datos
+import audiencias
+import datos_dashboard
+import ejecutor_en_proceso
+import incremental
+
 # Silenciar warnings
 warnings.filterwarnings("ignore")
 
@@ -19,59 +31,574 @@ RUTA_P001 = os.path.join(RUTA_BASE_PROYECTOS, "segmentacion")
 RUTA_P017 = os.path.join(RUTA_BASE_PROYECTOS, "churn_ltv")
 RUTA_P018 = os.path.join(RUTA_BASE_PROYECTOS, "recomendacion")
 
+# Salidas intermedias de cada notebook (deben coincidir con lo que escribe cada uno)
+RUTA_DATOS = "./data"
+RUTA_SEGMENTACION = os.path.join(RUTA_DATOS, "segmentacion_rfm.csv")
+RUTA_CHURN = os.path.join(RUTA_DATOS, "scores_churn.csv")
+RUTA_LTV = os.path.join(RUTA_DATOS, "scores_ltv.csv")
+
 # El archivo de salida que usará el dashboard
 RUTA_QUINTILES = "./data/rfm_churn_ltv.csv"
+# Misma salida en Parquet, con estadísticas por columna en el footer
+RUTA_PARQUET = "./data/rfm_churn_ltv.parquet"
+# Versión lista para el dashboard: columnas derivadas y tipos compactos
+# Las rutas que también leen el dashboard y las CLI se definen en sus módulos
+RUTA_DASHBOARD = datos_dashboard.RUTA_DATASET_POR_DEFECTO
+# Misma versión particionada (directorio particion=<clave>/), con --particiones
+RUTA_DASHBOARD_PARTICIONADO = os.path.splitext(RUTA_DASHBOARD)[0]
+# Cuentas y KPIs de cada preset de campaña (se publican junto al dataset)
+RUTA_AUDIENCIAS = audiencias.RUTA_AUDIENCIAS
+RUTA_RESUMEN_AUDIENCIAS = audiencias.RUTA_RESUMEN_AUDIENCIAS
+# Puntero a la última versión publicada (lo vigila el dashboard para recargar)
+RUTA_MANIFIESTO = datos_dashboard.RUTA_MANIFIESTO_POR_DEFECTO
+# Modo incremental (--delta): cuentas a repuntuar y sus filas nuevas
+RUTA_CUENTAS_AFECTADAS = incremental.RUTA_CUENTAS_AFECTADAS
+RUTA_PARQUET_CAMBIOS = incremental.RUTA_PARQUET_CAMBIOS
 # Logs en una carpeta del proyecto, no en tu carpeta personal
 RUTA_LOGS = "./logs"
 
+# Número de etapas que pueden correr a la vez (sobrescribible con --workers)
+WORKERS_POR_DEFECTO = int(os.environ.get("PIPELINE_WORKERS", 2))
+
+# Cómo se ejecutan las etapas (sobrescribible con --runner):
+#   papermill: un kernel de Jupyter por notebook, etapas en paralelo en procesos
+#   proceso:   todo en este proceso, en orden; sin arranque de kernels ni
+#              reimportaciones, y los DataFrames pasan de una etapa a otra en memoria
+RUNNERS = ["papermill", "proceso"]
+RUNNER_POR_DEFECTO = os.environ.get("PIPELINE_RUNNER", "papermill")
+
+# Finalización particionada (sobrescribible con --particiones / --particionar-por):
+#   0 particiones = un solo archivo; con NEGOCIO el número lo dan los negocios
+PARTICIONES_POR_DEFECTO = int(os.environ.get("PIPELINE_PARTICIONES", 0))
+PARTICIONAR_POR_DEFECTO = os.environ.get("PIPELINE_PARTICIONAR_POR", "hash")
+
+# Notebooks ejecutados (con sus salidas); los originales no se modifican
+RUTA_NOTEBOOKS_EJECUTADOS = os.path.join(RUTA_LOGS, "notebooks")
+
+# Estado de la última ejecución (para --resume)
+RUTA_ESTADO = os.path.join(RUTA_LOGS, "estado_pipeline.json")
+
 # Crear carpetas si no existen (para que no falle en otros entornos)
 os.makedirs(RUTA_LOGS, exist_ok=True)
 
-def ejecutar_notebook(ruta_carpeta, nombre_notebook):
+# --- GRAFO DE ETAPAS ---
+# Cada etapa declara qué archivos lee y cuáles produce; las dependencias
+# se deducen de ahí. Churn y LTV solo necesitan la segmentación, así que
+# corren en paralelo. Los "parametros" se inyectan con papermill y forman
+# parte de la huella de la etapa. Las etapas con "funcion" en lugar de
+# notebook son código Python del repo: reciben entradas, salidas y parámetros;
+# en "modulos" declaran los otros módulos del repo que usan, para la huella.
+#
+# Con `particiones` > 0 churn, LTV y recomendación se repiten por partición
+# (churn.p000, churn.p001, ...): cada copia recibe `particion` y `particiones`,
+# puntúa solo las cuentas de su cubeta de hash (preparacion_datos.en_particion)
+# y lee y escribe sus propios archivos (preparacion_datos.ruta_particion). Las
+# copias corren en el mismo pool; la etapa "parquet" junta sus CSV.
+#
+# Con `delta` (modo incremental) los notebooks reciben `cuentas_afectadas` y
+# solo puntúan esas cuentas; la etapa "fusion" las mezcla con la salida de la
+# versión publicada anterior (ver incremental.py).
+def construir_etapas(particiones=PARTICIONES_POR_DEFECTO, particionar_por=PARTICIONAR_POR_DEFECTO, delta=None):
+    if particiones > 0 or particionar_por == "NEGOCIO":
+        ruta_dashboard = RUTA_DASHBOARD_PARTICIONADO
+        parametros = {"por": particionar_por}
+        if particionar_por == "hash":
+            parametros["particiones"] = particiones or preparacion_datos.PARTICIONES_HASH
+        finalizacion = {"funcion": preparacion_datos.finalizar_dataset_particionado, "parametros": parametros}
+    else:
+        ruta_dashboard = RUTA_DASHBOARD
+        finalizacion = {"funcion": preparacion_datos.finalizar_dataset, "parametros": {}}
+
+    etapas = [
+        {
+            "nombre": "segmentacion",
+            "carpeta": RUTA_P001,
+            "notebook": "01_Segmentacion_Cartera.ipynb",
+            "entradas": [],
+            "salidas": [RUTA_SEGMENTACION],
+            "parametros": {},
+        },
+        {
+            "nombre": "churn",
+            "carpeta": RUTA_P017,
+            "notebook": "02_Modelo_Churn.ipynb",
+            "entradas": [RUTA_SEGMENTACION],
+            "salidas": [RUTA_CHURN],
+            "parametros": {},
+        },
+        {
+            "nombre": "ltv",
+            "carpeta": RUTA_P017,
+            "notebook": "03_Modelo_LTV.ipynb",
+            "entradas": [RUTA_SEGMENTACION],
+            "salidas": [RUTA_LTV],
+            "parametros": {},
+        },
+        {
+            "nombre": "recomendacion",
+            "carpeta": RUTA_P018,
+            "notebook": "04_Engine_Recomendacion.ipynb",
+            "entradas": [RUTA_CHURN, RUTA_LTV],
+            "salidas": [RUTA_QUINTILES],
+            "parametros": {},
+        },
+        {
+            "nombre": "parquet",
+            "funcion": preparacion_datos.convertir_csv_a_parquet,
+            "entradas": [RUTA_QUINTILES],
+            "salidas": [RUTA_PARQUET],
+            "parametros": {},
+        },
+        {
+            "nombre": "finalizacion",
+            "entradas": [RUTA_PARQUET],
+            "salidas": [ruta_dashboard],
+            **finalizacion,
+        },
+        {
+            "nombre": "audiencias",
+            "funcion": audiencias.materializar_audiencias,
+            # Carga, índice de filtros y cubo de KPIs vienen de datos_dashboard
+            "modulos": ["datos_dashboard", "preparacion_datos"],
+            "entradas": [ruta_dashboard],
+            "salidas": [RUTA_AUDIENCIAS, RUTA_RESUMEN_AUDIENCIAS],
+            "parametros": {},
+        },
+        {
+            "nombre": "publicacion",
+            "funcion": preparacion_datos.publicar_version,
+            # La salida completa sin finalizar viaja con la versión: es la base del modo incremental
+            "entradas": [ruta_dashboard, RUTA_AUDIENCIAS, RUTA_RESUMEN_AUDIENCIAS, RUTA_PARQUET],
+            "salidas": [RUTA_MANIFIESTO],
+            "parametros": {},
+        },
+    ]
+    if particiones > 0:
+        etapas = _repartir_puntuacion(etapas, particiones)
+    if delta is None:
+        return etapas
+
+    for etapa in etapas:
+        if "notebook" in etapa:
+            etapa["entradas"] = etapa["entradas"] + [RUTA_CUENTAS_AFECTADAS]
+            etapa["parametros"] = {**etapa["parametros"], "cuentas_afectadas": RUTA_CUENTAS_AFECTADAS}
+    posicion = next(i for i, e in enumerate(etapas) if e["nombre"] == "parquet")
+    etapas[posicion]["salidas"] = [RUTA_PARQUET_CAMBIOS]
+    etapas.insert(posicion + 1, {
+        "nombre": "fusion",
+        "funcion": incremental.fusionar_con_version,
+        "entradas": [RUTA_PARQUET_CAMBIOS, RUTA_CUENTAS_AFECTADAS, incremental.ruta_base(RUTA_MANIFIESTO)],
+        "salidas": [RUTA_PARQUET],
+        "parametros": {},
+    })
+    etapas.insert(0, {
+        "nombre": "afectadas",
+        "funcion": incremental.identificar_afectadas,
+        "entradas": [delta],
+        "salidas": [RUTA_CUENTAS_AFECTADAS],
+        "parametros": {},
+    })
+    return etapas
+
+def _repartir_puntuacion(etapas, particiones):
+    # La segmentación sigue siendo global: los modelos se entrenan sobre toda la cartera
+    por_particion = {"churn": RUTA_CHURN, "ltv": RUTA_LTV, "recomendacion": RUTA_QUINTILES}
+    repartidas = []
+    for etapa in etapas:
+        if etapa["nombre"] in por_particion:
+            for k in range(particiones):
+                rutas_k = {r: preparacion_datos.ruta_particion(r, k) for r in por_particion.values()}
+                repartidas.append({
+                    **etapa,
+                    "nombre": f"{etapa['nombre']}.p{k:03d}",
+                    "sufijo": f".p{k:03d}",
+                    "entradas": [rutas_k.get(r, r) for r in etapa["entradas"]],
+                    "salidas": [rutas_k.get(r, r) for r in etapa["salidas"]],
+                    "parametros": {**etapa["parametros"], "particion": k, "particiones": particiones},
+                })
+        elif etapa["nombre"] == "parquet":
+            repartidas.append({
+                **etapa,
+                "funcion": preparacion_datos.convertir_particiones_a_parquet,
+                "entradas": [preparacion_datos.ruta_particion(RUTA_QUINTILES, k) for k in range(particiones)],
+            })
+        else:
+            repartidas.append(etapa)
+    return repartidas
+
+ETAPAS = construir_etapas()
+
+def ejecutar_notebook(ruta_carpeta, nombre_notebook, parametros=None, runner=RUNNER_POR_DEFECTO, memoria=None,
+                      sufijo=""):
     # En la versión pública, asumimos que los notebooks están en el repo
     ruta_input = os.path.join(ruta_carpeta, nombre_notebook)
-    print(f"\n--- Ejecutando: {nombre_notebook} ---")
-    
-    try:
-        # Nota: En un entorno real de GitHub, estas rutas deben existir
+    # Cada partición deja su propia copia ejecutada (02_Modelo_Churn.p003.ipynb)
+    base, extension = os.path.splitext(nombre_notebook)
+    nombre_salida = f"{base}{sufijo}{extension}"
+    ruta_salida = os.path.join(RUTA_NOTEBOOKS_EJECUTADOS, nombre_salida)
+    os.makedirs(RUTA_NOTEBOOKS_EJECUTADOS, exist_ok=True)
+    print(f"\n--- Ejecutando: {nombre_salida} ---")
+
+    # Nota: En un entorno real de GitHub, estas rutas deben existir.
+    # Los errores se propagan: el planificador marca la etapa como fallida,
+    # no guarda su huella y un --resume la vuelve a intentar.
+    if runner == "proceso":
+        ejecutor_en_proceso.ejecutar_notebook_en_proceso(ruta_input, ruta_salida, parametros, memoria=memoria)
+    else:
         pm.execute_notebook(
             input_path=ruta_input,
-            output_path=ruta_input, # O una carpeta de 'output'
-            log_output=False, 
-            progress_bar=True
+            output_path=ruta_salida,
+            parameters=parametros or {},
+            log_output=False,
+            progress_bar=False # Con etapas en paralelo las barras se mezclan
         )
-        print(f"--- OK: {nombre_notebook} ---")
-    except Exception as e:
-        print(f"Error en {nombre_notebook}: {e}")
-        # En producción no querrás que el pipeline se detenga siempre, 
-        # pero para desarrollo está bien.
-        pass 
+    print(f"--- OK: {nombre_salida} ---")
+
+# --- CACHÉ POR HUELLA DE CONTENIDO ---
+# La huella de una etapa combina el código de su notebook (o de sus módulos),
+# sus parámetros y el contenido de sus archivos de entrada. Se guarda junto a
+# sus salidas; si al volver a correr coincide, la etapa se salta.
+
+def _hash_archivo(ruta, h, bloque=1024 * 1024):
+    if os.path.isdir(ruta):
+        # Directorio particionado: nombre relativo y contenido de cada archivo, en orden fijo
+        for raiz, carpetas, nombres in os.walk(ruta):
+            carpetas.sort()
+            for nombre in sorted(nombres):
+                completa = os.path.join(raiz, nombre)
+                h.update(os.path.relpath(completa, ruta).encode())
+                _hash_archivo(completa, h, bloque)
+        return
+    with open(ruta, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+
+def calcular_huella(etapa):
+    h = hashlib.sha256()
+
+    if "funcion" in etapa:
+        # Etapas Python: cuenta todo el módulo, no solo la función (usa auxiliares),
+        # y los módulos declarados. Van por nombre: la etapa viaja al pool con pickle
+        _hash_archivo(inspect.getsourcefile(etapa["funcion"]), h)
+        for modulo in etapa.get("modulos", []):
+            _hash_archivo(inspect.getsourcefile(importlib.import_module(modulo)), h)
+    else:
+        # Solo el código de las celdas: papermill reescribe las salidas del
+        # notebook en cada corrida y eso no debe invalidar la caché
+        ruta_nb = os.path.join(etapa["carpeta"], etapa["notebook"])
+        with open(ruta_nb, encoding="utf-8") as f:
+            nb = json.load(f)
+        for celda in nb.get("cells", []):
+            fuente = celda.get("source", "")
+            if isinstance(fuente, list):
+                fuente = "".join(fuente)
+            h.update(celda.get("cell_type", "").encode())
+            h.update(fuente.encode("utf-8"))
+
+    h.update(json.dumps(etapa.get("parametros", {}), sort_keys=True, default=str).encode())
+
+    for entrada in sorted(etapa["entradas"]):
+        h.update(entrada.encode())
+        _hash_archivo(entrada, h)
+
+    return h.hexdigest()
+
+def ruta_huella(etapa):
+    carpeta = os.path.dirname(etapa["salidas"][0]) or "."
+    return os.path.join(carpeta, f".{etapa['nombre']}.huella.json")
+
+def etapa_vigente(etapa, huella):
+    ruta = ruta_huella(etapa)
+    if not os.path.exists(ruta) or not all(os.path.exists(s) for s in etapa["salidas"]):
+        return False
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f).get("huella") == huella
+    except (OSError, ValueError):
+        return False
+
+def _escribir_json_atomico(ruta, datos):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+def guardar_huella(etapa, huella):
+    _escribir_json_atomico(ruta_huella(etapa), {
+        "etapa": etapa["nombre"],
+        "huella": huella,
+        "salidas": etapa["salidas"],
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+def ejecutar_etapa(etapa, forzar=False, runner=RUNNER_POR_DEFECTO, memoria=None):
+    # Corre dentro del pool: calcular la huella aquí reparte también el hash de los datos.
+    # `memoria` (solo runner "proceso") guarda las salidas ya cargadas por ruta.
+    registro = {
+        "etapa": etapa["nombre"],
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "runner": runner,
+    }
+    with telemetria.MedidorEtapa() as medidor:
+        huella = calcular_huella(etapa)
+        if not forzar and etapa_vigente(etapa, huella):
+            print(f"--- Sin cambios: {etapa['nombre']} (se reutilizan sus salidas) ---")
+            registro["estado"] = "vigente"
+        else:
+            if "funcion" in etapa:
+                print(f"\n--- Ejecutando: {etapa['nombre']} ---")
+                parametros = dict(etapa.get("parametros", {}))
+                if memoria is not None and "memoria" in inspect.signature(etapa["funcion"]).parameters:
+                    parametros["memoria"] = memoria
+                etapa["funcion"](*etapa["entradas"], *etapa["salidas"], **parametros)
+                print(f"--- OK: {etapa['nombre']} ---")
+            else:
+                ejecutar_notebook(etapa["carpeta"], etapa["notebook"], etapa.get("parametros"),
+                                  runner=runner, memoria=memoria, sufijo=etapa.get("sufijo", ""))
+
+            faltantes = [s for s in etapa["salidas"] if not os.path.exists(s)]
+            if faltantes:
+                raise FileNotFoundError(f"La etapa {etapa['nombre']} no generó: {faltantes}")
+
+            guardar_huella(etapa, huella)
+            registro["estado"] = "ok"
+
+    filas_in, bytes_in = telemetria.volumen_archivos(etapa["entradas"])
+    filas_out, bytes_out = telemetria.volumen_archivos(etapa["salidas"])
+    registro.update({
+        "wall_s": medidor.wall_s,
+        "cpu_s": medidor.cpu_s,
+        "rss_pico_mb": medidor.rss_pico_mb,
+        "filas_entrada": filas_in,
+        "filas_salida": filas_out,
+        "bytes_leidos": bytes_in,
+        "bytes_escritos": bytes_out,
+    })
+    return registro
+
+def cargar_estado():
+    if not os.path.exists(RUTA_ESTADO):
+        return None
+    try:
+        with open(RUTA_ESTADO, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-def generar_log_analisis(duracion_horas):
+def calcular_dependencias(etapas):
+    # Una etapa depende de otra si lee alguno de los archivos que la otra produce
+    productor = {}
+    for etapa in etapas:
+        for salida in etapa["salidas"]:
+            if salida in productor:
+                raise ValueError(f"La salida {salida} la producen dos etapas: {productor[salida]} y {etapa['nombre']}")
+            productor[salida] = etapa["nombre"]
+
+    dependencias = {}
+    for etapa in etapas:
+        dependencias[etapa["nombre"]] = {productor[e] for e in etapa["entradas"] if e in productor}
+
+    # Validar que no haya ciclos
+    _orden_topologico(dependencias)
+    return dependencias
+
+class _EjecutorLocal:
+    # Misma interfaz que el pool, pero cada etapa corre al enviarla, en este proceso
+    def __init__(self, memoria):
+        self.memoria = memoria
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args, memoria=self.memoria))
+        except Exception as e:
+            futuro.set_exception(e)
+        # Las etapas enviadas en la misma pasada terminan antes del wait(): sin
+        # esta marca, a cada una se le cobraría también lo que tardaron las siguientes
+        futuro.terminado = time.time()
+        return futuro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.memoria.clear()
+        return False
+
+def ejecutar_etapas(etapas, workers=WORKERS_POR_DEFECTO, forzar=False, estado=None, runner=RUNNER_POR_DEFECTO):
+    dependencias = calcular_dependencias(etapas)
+    por_nombre = {e["nombre"]: e for e in etapas}
+
+    # El estado se persiste tras cada etapa: si el proceso muere, --resume sabe dónde quedó
+    estado = estado or {
+        "id_ejecucion": datetime.now().strftime("%Y%m%d_%H%M%S_%f"),
+        "inicio": time.time(),
+        "etapas": {},
+    }
+    estado["completada"] = False
+    estado["etapas"] = {n: estado["etapas"].get(n, {"estado": "pendiente"}) for n in dependencias}
+    _escribir_json_atomico(RUTA_ESTADO, estado)
+
+    estados = {}  # nombre -> "ok" | "vigente" | "error" | "omitida"
+    duraciones = {}
+    registros = []  # telemetría por etapa; se escribe desde aquí para no mezclar líneas entre procesos
+    en_curso = {}  # future -> (nombre, inicio)
+    exitosos = ("ok", "vigente")
+
+    if runner == "proceso":
+        pool_etapas = _EjecutorLocal(memoria={})
+    else:
+        # Un proceso nuevo por etapa: en un worker reutilizado el pico de RSS y la
+        # memoria retenida incluirían a las etapas que corrieron antes en él
+        # (max_tasks_per_child existe desde Python 3.11)
+        if sys.version_info >= (3, 11):
+            pool_etapas = ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1)
+        else:
+            pool_etapas = ProcessPoolExecutor(max_workers=workers)
+
+    with pool_etapas as pool:
+        while len(estados) < len(etapas):
+            # Etapas cuyas dependencias fallaron no se ejecutan
+            for nombre, deps in dependencias.items():
+                if nombre not in estados and any(estados.get(d) in ("error", "omitida") for d in deps):
+                    estados[nombre] = "omitida"
+                    estado["etapas"][nombre] = {"estado": "omitida"}
+                    print(f"--- Omitida: {nombre} (falló una etapa previa) ---")
+
+            lanzadas = {n for n, _ in en_curso.values()}
+            for nombre, deps in dependencias.items():
+                if nombre in estados or nombre in lanzadas:
+                    continue
+                if all(estados.get(d) in exitosos for d in deps):
+                    inicio = time.time()  # antes de enviar: el ejecutor local corre la etapa en submit
+                    futuro = pool.submit(ejecutar_etapa, por_nombre[nombre], forzar, runner)
+                    en_curso[futuro] = (nombre, inicio)
+
+            if not en_curso:
+                break
+
+            terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                nombre, inicio = en_curso.pop(futuro)
+                duraciones[nombre] = getattr(futuro, "terminado", time.time()) - inicio
+                try:
+                    registro = futuro.result()
+                except Exception as e:
+                    print(f"Error en {nombre}: {e}")
+                    registro = {"etapa": nombre, "estado": "error", "error": str(e),
+                                "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                "wall_s": duraciones[nombre]}
+                registro["id_ejecucion"] = estado["id_ejecucion"]
+                estados[nombre] = registro["estado"]
+                registros.append(registro)
+                telemetria.registrar([registro])
+
+                estado["etapas"][nombre] = {"estado": estados[nombre], "duracion": duraciones[nombre]}
+                _escribir_json_atomico(RUTA_ESTADO, estado)
+
+    estado["completada"] = all(estados.get(n) in exitosos for n in dependencias)
+    _escribir_json_atomico(RUTA_ESTADO, estado)
+
+    # Ruta crítica: la cadena de dependencias más larga en tiempo
+    acumulado = {}
+    for nombre in _orden_topologico(dependencias):
+        previo = max((acumulado[d] for d in dependencias[nombre]), default=0)
+        acumulado[nombre] = previo + duraciones.get(nombre, 0)
+    ruta_critica = max(acumulado.values(), default=0)
+
+    print("\n--- Resumen de etapas ---")
+    for etapa in etapas:
+        nombre = etapa["nombre"]
+        print(f"{nombre:<15} {estados.get(nombre, '-'):<8} {duraciones.get(nombre, 0) / 60:8.1f} min")
+    print(f"Ruta crítica: {ruta_critica / 3600:.2f} hrs.")
+    print(f"Telemetría por etapa en: {telemetria.RUTA_TELEMETRIA} (compara con: python telemetria.py)")
+
+    return estados, registros
+
+def comparar_runners(workers=WORKERS_POR_DEFECTO, etapas=ETAPAS):
+    # Corre el pipeline completo (sin caché) con cada runner y compara por etapa.
+    # Incluye el arranque de kernels e importaciones, que es justo lo que cambia.
+    tiempos, totales = {}, {}
+    for runner in RUNNERS:
+        print(f"\n=== Runner: {runner} ===")
+        inicio = time.time()
+        estados, registros = ejecutar_etapas(etapas, workers=workers, forzar=True, runner=runner)
+        totales[runner] = time.time() - inicio
+        if any(e not in ("ok", "vigente") for e in estados.values()):
+            print(f"El runner {runner} no completó todas las etapas; no se puede comparar.")
+            return 1
+        tiempos[runner] = {r["etapa"]: r.get("wall_s") for r in registros}
+
+    print("\n--- Comparación de runners (segundos) ---")
+    print(f"{'Etapa':<15} " + " ".join(f"{r:>11}" for r in RUNNERS))
+    for etapa in etapas:
+        print(f"{etapa['nombre']:<15} " + " ".join(f"{tiempos[r].get(etapa['nombre']) or 0:>11.2f}" for r in RUNNERS))
+    print(f"{'Total':<15} " + " ".join(f"{totales[r]:>11.2f}" for r in RUNNERS))
+    print("(papermill corre en paralelo las etapas independientes; proceso, en serie)")
+
+    _escribir_json_atomico(os.path.join(RUTA_LOGS, "comparacion_runners.json"), {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "workers": workers,
+        "por_etapa_s": tiempos,
+        "total_s": totales,
+    })
+    return 0
+
+def _orden_topologico(dependencias):
+    orden, resueltas = [], set()
+    while len(orden) < len(dependencias):
+        listas = [n for n, d in dependencias.items() if n not in resueltas and d <= resueltas]
+        if not listas:
+            pendientes = sorted(set(dependencias) - resueltas)
+            raise ValueError(f"Ciclo de dependencias entre etapas: {pendientes}")
+        orden.extend(listas)
+        resueltas.update(listas)
+    return orden
+
+def generar_log_analisis(duracion_horas, registros=None):
     print("\n--- Generando log de ejecución ---")
     try:
-        # Verificamos si el archivo existe antes de analizar
-        if not os.path.exists(RUTA_QUINTILES):
+        # Preferimos el Parquet: filas, esquema y estadísticas salen del footer
+        # sin leer los datos. El CSV heredado se recorre por trozos.
+        if os.path.exists(RUTA_PARQUET):
+            ruta_datos = RUTA_PARQUET
+            stats = preparacion_datos.estadisticas_parquet(RUTA_PARQUET)
+        elif os.path.exists(RUTA_QUINTILES):
+            ruta_datos = RUTA_QUINTILES
+            stats = preparacion_datos.estadisticas_csv(RUTA_QUINTILES)
+        else:
             print("Archivo de datos no encontrado para el log.")
             return
 
-        size_mb = os.path.getsize(RUTA_QUINTILES) / (1024 * 1024)
-        df = pd.read_csv(RUTA_QUINTILES, low_memory=False)
-        filas, columnas = df.shape
+        size_mb = os.path.getsize(ruta_datos) / (1024 * 1024)
+        filas, columnas = stats["filas"], stats["columnas"]
+
+        detalle_columnas = ""
+        for col, tipo in stats["esquema"].items():
+            c = stats["por_columna"].get(col, {})
+            rango = f"[{c['min']} .. {c['max']}]" if c.get("min") is not None else ""
+            detalle_columnas += f"  {col:<35} {tipo:<10} nulos: {c.get('nulos', 0):>10,} {rango}\n"
         
         fecha_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ruta_completa_log = os.path.join(RUTA_LOGS, "pipeline_log.txt")
+
+        # Desglose por etapa (el detalle completo queda en la telemetría JSONL)
+        detalle_etapas = ""
+        for r in registros or []:
+            detalle_etapas += f"  {r['etapa']:<15} {r['estado']:<8} {(r.get('wall_s') or 0) / 60:8.1f} min\n"
         
         contenido = (
             f"\n{'#'*80}\n"
             f"EJECUCIÓN SISTEMA DE INTELIGENCIA: {fecha_str}\n"
             f"{'='*80}\n"
             f"MÉTRICAS DE RENDIMIENTO:\n"
-            f"Tiempo de procesamiento: {duracion_horas:.2f} horas\n\n"
+            f"Tiempo de procesamiento: {duracion_horas:.2f} horas\n"
+            f"{detalle_etapas}\n"
             f"DATASET PROCESADO:\n"
             f"Registros: {filas:,}\n"
             f"Variables: {columnas}\n"
-            f"Tamaño: {size_mb:.2f} MB\n"
+            f"Tamaño: {size_mb:.2f} MB ({os.path.basename(ruta_datos)})\n"
+            f"{detalle_columnas}"
             f"{'='*80}\n"
             f"Status: Pipeline completado satisfactoriamente.\n"
             f"{'#'*80}\n"
@@ -85,16 +612,62 @@ def generar_log_analisis(duracion_horas):
         print(f"Error al generar log: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline de Inteligencia de Clientes")
+    parser.add_argument("--workers", type=int, default=WORKERS_POR_DEFECTO,
+                        help="Etapas independientes que pueden ejecutarse a la vez")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Ignorar las huellas y volver a ejecutar todas las etapas")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar la última ejecución desde la primera etapa fallida o desactualizada")
+    parser.add_argument("--runner", choices=RUNNERS, default=RUNNER_POR_DEFECTO,
+                        help="papermill (un kernel por notebook) o proceso (todo en este proceso)")
+    parser.add_argument("--comparar-runners", action="store_true",
+                        help="Ejecutar todas las etapas con cada runner y comparar tiempos")
+    parser.add_argument("--particiones", type=int, default=PARTICIONES_POR_DEFECTO,
+                        help="Puntuar y finalizar el dataset en N particiones en paralelo (0 = un solo archivo)")
+    parser.add_argument("--particionar-por", choices=preparacion_datos.PARTICIONAR_POR, default=PARTICIONAR_POR_DEFECTO,
+                        help="hash de CUENTA (N particiones) o NEGOCIO (una partición por negocio)")
+    parser.add_argument("--delta",
+                        help="Transacciones nuevas (CSV o Parquet con CUENTA): solo se repuntúan esas cuentas "
+                             "y se fusionan con la última versión publicada. Sin --delta, reconstrucción completa")
+    args = parser.parse_args()
+    try:
+        etapas = construir_etapas(max(0, args.particiones), args.particionar_por, delta=args.delta)
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+
+    if args.comparar_runners:
+        sys.exit(comparar_runners(workers=max(1, args.workers), etapas=etapas))
+
     inicio_proceso = time.time()
+    estado_previo = None
+
+    if args.resume:
+        estado_previo = cargar_estado()
+        if estado_previo is None or estado_previo.get("completada"):
+            print("No hay una ejecución interrumpida que reanudar; se inicia una nueva.")
+            estado_previo = None
+        else:
+            # Se conserva el inicio original para que el log refleje el tiempo total
+            inicio_proceso = estado_previo["inicio"]
+            orden = _orden_topologico(calcular_dependencias(etapas))
+            pendientes = [n for n in orden if estado_previo["etapas"].get(n, {}).get("estado") not in ("ok", "vigente")]
+            print(f"Reanudando ejecución {estado_previo['id_ejecucion']} desde: {pendientes[0] if pendientes else orden[0]}")
+            print("(Las etapas completadas se revalidan por huella y se saltan si siguen vigentes)")
 
     # Los nombres de los notebooks también pueden ser anonimizados si tienen nombres de marcas
-    ejecutar_notebook(RUTA_P001, "01_Segmentacion_Cartera.ipynb")
-    ejecutar_notebook(RUTA_P017, "02_Modelo_Churn.ipynb")
-    ejecutar_notebook(RUTA_P017, "03_Modelo_LTV.ipynb")
-    ejecutar_notebook(RUTA_P018, "04_Engine_Recomendacion.ipynb")
-    
+    estados, registros = ejecutar_etapas(etapas, workers=max(1, args.workers), forzar=args.forzar,
+                                         estado=estado_previo, runner=args.runner)
+
     fin_proceso = time.time()
     duracion_horas = (fin_proceso - inicio_proceso) / 3600
 
-    generar_log_analisis(duracion_horas)
-    print(f"\nProceso finalizado. Tiempo: {duracion_horas:.2f} hrs.")
\ No newline at end of file
+    fallidas = [n for n, e in estados.items() if e in ("error", "omitida")]
+    if fallidas:
+        print(f"\nPipeline incompleto. Etapas sin terminar: {', '.join(fallidas)}")
+        print("Corrige el error y ejecuta: python run_pipeline.py --resume")
+        sys.exit(1)
+
+    generar_log_analisis(duracion_horas, registros)
+    print(f"\nProceso finalizado. Tiempo: {duracion_horas:.2f} hrs.")
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from statistics import median
+
+# psutil es opcional: sin él se usa resource (solo Unix) y en Windows
+# quedan sin medir la CPU y la memoria pico
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RUTA_TELEMETRIA = os.path.join("./logs", "telemetria_etapas.jsonl")
+
+# Métricas que se comparan contra la línea base
+METRICAS = ["wall_s", "cpu_s", "rss_pico_mb", "bytes_leidos", "bytes_escritos"]
+
+
+# --- MEDICIÓN DE UNA ETAPA ---
+def rss_mb():
+    # Memoria residente actual de este proceso, en MB. Sin psutil, None:
+    # resource solo da el pico (ru_maxrss), no sirve para medir deltas
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class MedidorEtapa:
+    # Mide tiempo de pared, CPU y memoria pico del proceso actual y de sus hijos
+    # (el kernel de Jupyter que lanza papermill vive en un subproceso)
+
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.wall_s = None
+        self.cpu_s = None
+        self.rss_pico_mb = None
+        self._cpu_hijos = {}
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        if psutil is not None:
+            self._proceso = psutil.Process()
+            self._cpu_inicial = self._cpu_propia()
+            self._rss_pico = 0
+            self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+            self._hilo.start()
+        elif resource is not None:
+            self._uso_inicial = (resource.getrusage(resource.RUSAGE_SELF),
+                                 resource.getrusage(resource.RUSAGE_CHILDREN))
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = time.perf_counter() - self._inicio
+        if psutil is not None:
+            self._detener.set()
+            self._hilo.join()
+            self._muestra()
+            self.cpu_s = self._cpu_propia() - self._cpu_inicial + sum(self._cpu_hijos.values())
+            self.rss_pico_mb = self._rss_pico / (1024 * 1024)
+        elif resource is not None:
+            propio = resource.getrusage(resource.RUSAGE_SELF)
+            hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+            propio_0, hijos_0 = self._uso_inicial
+            self.cpu_s = (propio.ru_utime + propio.ru_stime - propio_0.ru_utime - propio_0.ru_stime
+                          + hijos.ru_utime + hijos.ru_stime - hijos_0.ru_utime - hijos_0.ru_stime)
+            # ru_maxrss es el pico de toda la vida del proceso: por eso el
+            # pipeline corre cada etapa en un worker nuevo. Viene en KB en
+            # Linux y en bytes en macOS
+            escala = 1 if sys.platform == "darwin" else 1024
+            self.rss_pico_mb = max(propio.ru_maxrss, hijos.ru_maxrss) * escala / (1024 * 1024)
+        return False
+
+    def _cpu_propia(self):
+        t = self._proceso.cpu_times()
+        return t.user + t.system
+
+    def _muestra(self):
+        try:
+            rss = self._proceso.memory_info().rss
+            for hijo in self._proceso.children(recursive=True):
+                try:
+                    rss += hijo.memory_info().rss
+                    t = hijo.cpu_times()
+                    self._cpu_hijos[hijo.pid] = t.user + t.system
+                except psutil.Error:
+                    pass
+            self._rss_pico = max(self._rss_pico, rss)
+        except psutil.Error:
+            pass
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            self._muestra()
+
+
+# --- VOLUMEN DE DATOS ---
+def _archivos(ruta):
+    # Un archivo, o todos los de un directorio (Parquet particionado)
+    if not os.path.isdir(ruta):
+        return [ruta]
+    return [os.path.join(raiz, nombre) for raiz, _, nombres in os.walk(ruta) for nombre in sorted(nombres)]
+
+
+def contar_filas(ruta):
+    if not os.path.exists(ruta):
+        return None
+    if os.path.isdir(ruta):
+        return _suma(contar_filas(r) for r in _archivos(ruta) if r.endswith(".parquet"))
+    if ruta.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(ruta).metadata.num_rows
+    if not ruta.endswith(".csv"):
+        return None
+    # CSV: contar saltos de línea por bloques, sin parsear
+    lineas = 0
+    ultimo = b"\n"
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            lineas += bloque.count(b"\n")
+            ultimo = bloque[-1:]
+    if ultimo != b"\n":
+        lineas += 1
+    return max(lineas - 1, 0)  # sin encabezado
+
+
+def _suma(valores):
+    valores = [v for v in valores if v is not None]
+    return sum(valores) if valores else None
+
+
+def volumen_archivos(rutas):
+    filas = _suma(contar_filas(r) for r in rutas)
+    tam = _suma(os.path.getsize(a) for r in rutas if os.path.exists(r) for a in _archivos(r))
+    return filas, tam
+
+
+# --- REGISTRO JSONL ---
+def registrar(registros, ruta=RUTA_TELEMETRIA):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def leer_registros(ruta=RUTA_TELEMETRIA):
+    registros = []
+    if not os.path.exists(ruta):
+        return registros
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    pass  # línea truncada por una corrida interrumpida
+    return registros
+
+
+# --- COMPARACIÓN CONTRA LÍNEA BASE ---
+def comparar(registros, ventana=5, umbral=0.25):
+    # Solo cuentan etapas que realmente se ejecutaron (las vigentes se saltaron)
+    ejecutadas = [r for r in registros if r.get("estado") == "ok"]
+    corridas = sorted({r["id_ejecucion"] for r in ejecutadas},
+                      key=lambda i: min(r["fecha"] for r in ejecutadas if r["id_ejecucion"] == i))
+    if not corridas:
+        return None, [], []
+
+    ultima = corridas[-1]
+    previas = set(corridas[-1 - ventana:-1])
+    alertas = []
+    filas = []
+
+    for actual in (r for r in ejecutadas if r["id_ejecucion"] == ultima):
+        # Solo contra corridas con el mismo runner (papermill y proceso no son comparables)
+        historial = [r for r in ejecutadas if r["id_ejecucion"] in previas and r["etapa"] == actual["etapa"]
+                     and r.get("runner", "papermill") == actual.get("runner", "papermill")]
+        for metrica in METRICAS:
+            valor = actual.get(metrica)
+            base = [r[metrica] for r in historial if r.get(metrica) is not None]
+            if valor is None or not base:
+                continue
+            referencia = median(base)
+            cambio = (valor - referencia) / referencia if referencia else 0.0
+            fila = {"etapa": actual["etapa"], "metrica": metrica, "actual": valor,
+                    "base": referencia, "cambio": cambio, "muestras": len(base)}
+            filas.append(fila)
+            if cambio > umbral:
+                alertas.append(fila)
+
+    return ultima, filas, alertas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara la última corrida del pipeline contra su línea base")
+    parser.add_argument("--ruta", default=RUTA_TELEMETRIA, help="Archivo JSONL de telemetría")
+    parser.add_argument("--ventana", type=int, default=5, help="Corridas previas que forman la línea base")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Aumento relativo que se considera regresión")
+    args = parser.parse_args(argv)
+
+    ultima, filas, alertas = comparar(leer_registros(args.ruta), ventana=args.ventana, umbral=args.umbral)
+    if ultima is None:
+        print("Sin corridas registradas.")
+        return 0
+
+    print(f"Corrida {ultima} contra la mediana de las {args.ventana} anteriores\n")
+    print(f"{'Etapa':<15} {'Métrica':<15} {'Actual':>14} {'Base':>14} {'Cambio':>8}")
+    for f in filas:
+        marca = "  <-- REGRESIÓN" if f in alertas else ""
+        print(f"{f['etapa']:<15} {f['metrica']:<15} {f['actual']:>14,.2f} {f['base']:>14,.2f} {f['cambio']:>+8.1%}{marca}")
+
+    if alertas:
+        print(f"\n{len(alertas)} métrica(s) por encima del umbral de {args.umbral:.0%}.")
+        return 1
+    print("\nSin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
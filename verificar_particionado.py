@@ -0,0 +1,103 @@
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import preparacion_datos
+import datos_sinteticos
+import incremental
+
+# Verificación de la finalización particionada: el mismo Parquet se finaliza en
+# un solo archivo y particionado, y ambos deben coincidir por cuenta, en el tipo
+# de cada columna (categorías del texto incluidas) y en sus nulos. Un
+# Potencial_Valor nulo saca a la cuenta de todos los filtros, KPIs y audiencias
+# del dashboard.
+# Corre sobre un caso armado con CLV en los extremos y sobre carteras
+# sintéticas de varias semillas.
+
+SEMILLAS = list(range(1, 13))
+CUENTAS = 20_000
+
+
+def caso_extremos(ruta):
+    # El mínimo y el máximo de CLV cambian al redondearlos a float32: si las
+    # derivaciones se hicieran después de compactar, quedarían fuera de los cuartiles
+    pq.write_table(pa.table({
+        'CUENTA': ['0000000001', '0000000002', '0000000003', '0000000004'],
+        'NEGOCIO': ['Retail', 'Retail', 'Mayoreo', 'Mayoreo'],
+        'Probabilidad_Compra_90d': [0.1, 0.4, 0.6, 0.9],
+        'CLV_90dias': [0.10002, 20.0, 30.0, 1234.56781],
+    }), ruta)
+
+
+def _leer(ruta):
+    df = pd.read_parquet(ruta)
+    df.columns = df.columns.str.strip()
+    return df.drop(columns=[c for c in (preparacion_datos.COLUMNA_PARTICION,) if c in df.columns])
+
+
+def verificar(ruta_parquet, carpeta, por="hash", particiones=preparacion_datos.PARTICIONES_HASH):
+    unico = os.path.join(carpeta, "unico.parquet")
+    particionado = os.path.join(carpeta, "particionado")
+    preparacion_datos.finalizar_dataset(ruta_parquet, unico)
+    preparacion_datos.finalizar_dataset_particionado(ruta_parquet, particionado, por=por, particiones=particiones)
+
+    diferencias = incremental.comparar_datasets(unico, particionado, tolerancia=0)
+    a, b = _leer(unico), _leer(particionado)
+
+    nulos_a, nulos_b = a.isna().sum(), b.isna().sum()
+    nulos = {col: (int(nulos_a[col]), int(nulos_b[col])) for col in nulos_a.index
+             if col in nulos_b.index and nulos_a[col] != nulos_b[col]}
+    if nulos:
+        diferencias["nulos"] = nulos
+
+    # Todos los tipos deben ser iguales, categorías incluidas
+    tipos = {col: (str(a[col].dtype), str(b[col].dtype)) for col in a.columns
+             if col in b.columns and a[col].dtype != b[col].dtype}
+    if tipos:
+        diferencias["tipos"] = tipos
+    return diferencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara la finalización particionada con la de un solo archivo")
+    parser.add_argument("--parquet", help="Parquet de entrada a verificar (por defecto, casos sintéticos)")
+    parser.add_argument("--semillas", nargs="+", type=int, default=SEMILLAS)
+    parser.add_argument("--cuentas", type=int, default=CUENTAS, help="Cuentas por cartera sintética")
+    parser.add_argument("--por", choices=preparacion_datos.PARTICIONAR_POR, default="hash")
+    parser.add_argument("--particiones", type=int, default=preparacion_datos.PARTICIONES_HASH)
+    args = parser.parse_args(argv)
+
+    fallidos = 0
+    with tempfile.TemporaryDirectory() as carpeta:
+        casos = []
+        if args.parquet:
+            casos.append((args.parquet, args.parquet))
+        else:
+            ruta = os.path.join(carpeta, "extremos.parquet")
+            caso_extremos(ruta)
+            casos.append(("CLV en los extremos", ruta))
+            for semilla in args.semillas:
+                ruta = os.path.join(carpeta, f"semilla_{semilla}.parquet")
+                datos_sinteticos.generar(args.cuentas, ruta, semilla)
+                casos.append((f"{args.cuentas:,} cuentas, semilla {semilla}", ruta))
+
+        for i, (nombre, ruta) in enumerate(casos):
+            destino = os.path.join(carpeta, f"caso_{i}")
+            os.makedirs(destino)
+            diferencias = verificar(ruta, destino, args.por, args.particiones)
+            print(f"{nombre}: {'OK' if not diferencias else diferencias}")
+            fallidos += bool(diferencias)
+
+    if fallidos:
+        print(f"\n{fallidos} de {len(casos)} caso(s) con diferencias.")
+        return 1
+    print(f"\nLos {len(casos)} casos coinciden.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())